@@ -1,14 +1,35 @@
-from flask import Flask, render_template, request, redirect, session, jsonify
+from flask import Flask, Response, g, render_template, request, redirect, session, jsonify, send_from_directory, url_for
 from werkzeug.security import check_password_hash, generate_password_hash
-from werkzeug.utils import secure_filename
-import timetable
+from availability import build_index
+from avatars import AvatarError, avatar_url_path, is_content_addressed, remove_replaced_avatar, save_avatar
+from institute_config import ConfigError, config_form_values, load_config, parse_config_form, save_config
+from notifications import Dispatcher, Outbox, create_transports, recipients
+from render_cache import FragmentCache, FragmentCacheExtension, file_version, fragment_cache, store_version
+from session_store import ServerSideSessionInterface, create_session_backend
+from snapshots import is_snapshot_file, load_snapshot_manifest, publish_snapshots
+from substitution import ABSENT_LABEL, SUBSTITUTE_PREFIX, propose_substitutes, substituted_row
+from timetable_diff import diff_timetables, summarize
+import generation_service
 import os
 from datetime import datetime
+import gzip
 import json
+import sqlite3
+import threading
+import time
 import uuid
+from contextlib import contextmanager
+import metrics
+import profiler
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
 app.secret_key = "very-secret-key"
+app.jinja_env.add_extension(FragmentCacheExtension)
 print("SMART TIMETABLE SERVER STARTED")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 USERS_FILE = os.path.join(BASE_DIR, "users.txt")
@@ -18,11 +39,53 @@ TIMETABLE_FILE = os.path.join(BASE_DIR, "timetable_output.txt")
 HISTORY_FILE = os.path.join(BASE_DIR, "approval_history.txt")
 PREFERENCE_REQUESTS_FILE = os.path.join(BASE_DIR, "preference_requests.txt")
 PREFERENCE_HISTORY_FILE = os.path.join(BASE_DIR, "preference_history.txt")
-MAX_ROOM_CAPACITY = 50
 PROFILE_UPLOAD_DIR = os.path.join(BASE_DIR, "static", "profile_pics")
 ALLOWED_IMAGE_EXT = {".png", ".jpg", ".jpeg", ".webp"}
+IMMUTABLE_CACHE_SECONDS = 365 * 24 * 3600
 EVENTS_FILE = os.path.join(BASE_DIR, "events.txt")
 TIMETABLE_HISTORY_FILE = os.path.join(BASE_DIR, "timetable_history.txt")
+TIMETABLE_ALTERNATIVES_FILE = os.path.join(BASE_DIR, "timetable_alternatives.json")
+MAX_ALTERNATIVES = 5
+INSTITUTE_CONFIG_FILE = os.path.join(BASE_DIR, "institute_config.json")
+STORE_FILES = {
+    "users": USERS_FILE,
+    "data": DATA_FILE,
+    "timetable": TIMETABLE_FILE,
+    "timetable_history": TIMETABLE_HISTORY_FILE,
+    "timetable_alternatives": TIMETABLE_ALTERNATIVES_FILE,
+    "preference_requests": PREFERENCE_REQUESTS_FILE,
+    "events": EVENTS_FILE,
+    "institute_config": INSTITUTE_CONFIG_FILE
+}
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", "0"))   # 0 = auto-capture off
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "500"))
+PROFILE_MAX_AGE_DAYS = float(os.environ.get("PROFILE_MAX_AGE_DAYS", "7"))
+PROFILE_HEADER = "X-Profile-Request"
+PROJECT_PY_FILES = {f for f in os.listdir(BASE_DIR) if f.endswith(".py")}
+COMPRESS_MIN_BYTES = 500
+COMPRESS_MIMETYPES = {
+    "text/html",
+    "text/css",
+    "text/plain",
+    "application/json",
+    "application/javascript",
+    "text/javascript"
+}
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory")   # memory | sqlite
+SESSION_DB_FILE = os.environ.get("SESSION_DB_FILE", os.path.join(BASE_DIR, "sessions.db"))
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", str(12 * 3600)))
+NOTIFY_TRANSPORTS = [t.strip() for t in os.environ.get("NOTIFY_TRANSPORT", "inapp").split(",") if t.strip()]   # inapp, smtp
+NOTIFY_DB_FILE = os.environ.get("NOTIFY_DB_FILE", os.path.join(BASE_DIR, "notifications.db"))
+NOTIFY_BATCH_USERS = int(os.environ.get("NOTIFY_BATCH_USERS", "200"))
+NOTIFY_COALESCE_SECONDS = float(os.environ.get("NOTIFY_COALESCE_SECONDS", "2"))
+NOTIFY_STREAM_SECONDS = 55      # SSE connection length; EventSource reconnects
+NOTIFY_POLL_SECONDS = 2
+SMTP_HOST = os.environ.get("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "25"))
+SMTP_SENDER = os.environ.get("SMTP_SENDER", "timetable@localhost")
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "static", "snapshots")
 SEMESTER_OPTIONS = [
     ("jan_apr", "Jan-Apr Semester"),
     ("aug_nov", "Aug-Nov Semester"),
@@ -30,6 +93,9 @@ SEMESTER_OPTIONS = [
     ("jan_may", "Jan-May Semester")
 ]
 
+session_backend = create_session_backend(SESSION_BACKEND, SESSION_DB_FILE, SESSION_TTL_SECONDS)
+app.session_interface = ServerSideSessionInterface(session_backend)
+
 
 def infer_default_semester_key(month):
     if month in (1, 2, 3, 4):
@@ -52,6 +118,24 @@ def build_semester_label(key, year):
     return labels.get(key, f"{year_str} Jan-Apr Semester")
 
 
+@contextmanager
+def open_store(file_path, mode="r"):
+    # open() for the text stores, recording per-file ops, bytes and time.
+    op = "read" if mode.startswith("r") else "write"
+    labels = (("file", os.path.basename(file_path)), ("op", op))
+    t0 = time.perf_counter()
+    with open(file_path, mode) as f:
+        start = f.tell()
+        yield f
+        if op == "read":
+            size = os.fstat(f.fileno()).st_size
+        else:
+            size = f.tell() - start
+    metrics.inc("smarttimetable_store_ops_total", labels)
+    metrics.inc("smarttimetable_store_bytes_total", labels, size)
+    metrics.observe("smarttimetable_store_duration_seconds", labels, time.perf_counter() - t0)
+
+
 def append_line_safe(file_path, line):
     # Ensure appended records always start on a new line.
     needs_newline = False
@@ -60,7 +144,7 @@ def append_line_safe(file_path, line):
             f.seek(-1, os.SEEK_END)
             needs_newline = f.read(1) not in (b"\n", b"\r")
 
-    with open(file_path, "a") as f:
+    with open_store(file_path, "a") as f:
         if needs_newline:
             f.write("\n")
         f.write(line.rstrip("\n") + "\n")
@@ -163,7 +247,7 @@ def serialize_preference_request(req):
 def load_preference_requests():
     requests = []
     if os.path.exists(PREFERENCE_REQUESTS_FILE):
-        with open(PREFERENCE_REQUESTS_FILE) as f:
+        with open_store(PREFERENCE_REQUESTS_FILE) as f:
             for line in f:
                 parsed = parse_preference_request_line(line)
                 if parsed:
@@ -172,7 +256,7 @@ def load_preference_requests():
 
 
 def save_preference_requests(requests):
-    with open(PREFERENCE_REQUESTS_FILE, "w") as f:
+    with open_store(PREFERENCE_REQUESTS_FILE, "w") as f:
         for req in requests:
             f.write(serialize_preference_request(req) + "\n")
 
@@ -180,7 +264,7 @@ def save_preference_requests(requests):
 def load_courses():
     courses = []
     if os.path.exists(DATA_FILE):
-        with open(DATA_FILE) as f:
+        with open_store(DATA_FILE) as f:
             for line in f:
                 parsed = parse_course_line(line)
                 if parsed:
@@ -189,7 +273,7 @@ def load_courses():
 
 
 def save_courses(courses):
-    with open(DATA_FILE, "w") as f:
+    with open_store(DATA_FILE, "w") as f:
         for course in courses:
             f.write(serialize_course(course) + "\n")
 
@@ -217,6 +301,12 @@ def find_course(courses, subject, teacher, target):
 
 
 def apply_timetable_delete(day, slot, subject, room, teacher, target):
+    index = load_availability()
+    with index.lock:
+        return _apply_timetable_delete(index, day, slot, subject, room, teacher, target)
+
+
+def _apply_timetable_delete(index, day, slot, subject, room, teacher, target):
     rows = load_timetable_rows()
     filtered = []
     deleted = False
@@ -232,11 +322,12 @@ def apply_timetable_delete(day, slot, subject, room, teacher, target):
         )
         if match and not deleted:
             deleted = True
+            index.remove(row)
             continue
         filtered.append(row)
 
     if deleted:
-        save_timetable_rows(filtered)
+        save_timetable_rows(filtered, "Class removed")
 
         # Keep generation source in sync.
         courses = load_courses()
@@ -248,11 +339,21 @@ def apply_timetable_delete(day, slot, subject, room, teacher, target):
                 prefs.remove(old_pref)
                 course["prefs"] = normalize_prefs(prefs)
                 save_courses(courses)
+        restamp_availability(index)
 
     return deleted
 
 
 def apply_timetable_update(old_row, new_row):
+    # Returns (found, conflicts). Teacher/room/capacity/slot conflicts are
+    # blocking and leave the timetable untouched; department overlaps are
+    # saved and reported back as warnings.
+    index = load_availability()
+    with index.lock:
+        return _apply_timetable_update(index, old_row, new_row)
+
+
+def _apply_timetable_update(index, old_row, new_row):
     rows = load_timetable_rows()
     target_index = -1
     for i, row in enumerate(rows):
@@ -268,10 +369,14 @@ def apply_timetable_update(old_row, new_row):
             break
 
     if target_index == -1:
-        return False
+        return False, []
+
+    conflicts = index.move(rows[target_index], new_row)
+    if any(c["blocking"] for c in conflicts):
+        return True, conflicts
 
     rows[target_index] = new_row
-    save_timetable_rows(rows)
+    save_timetable_rows(rows, "Class updated")
 
     # Keep generation source in sync for next "Generate".
     courses = load_courses()
@@ -300,8 +405,9 @@ def apply_timetable_update(old_row, new_row):
 
     if changed_courses:
         save_courses(courses)
+    restamp_availability(index)
 
-    return True
+    return True, conflicts
 
 
 def parse_history_line(line):
@@ -361,7 +467,7 @@ def log_preference_action(action, request_data):
 def load_timetable_rows():
     rows = []
     if os.path.exists(TIMETABLE_FILE):
-        with open(TIMETABLE_FILE) as f:
+        with open_store(TIMETABLE_FILE) as f:
             for line in f:
                 parts = line.strip().split(",")
                 if len(parts) < 4:
@@ -378,8 +484,10 @@ def load_timetable_rows():
     return rows
 
 
-def save_timetable_rows(rows):
-    with open(TIMETABLE_FILE, "w") as f:
+def save_timetable_rows(rows, event=None):
+    # event: tell the affected teachers/students what changed (outbox).
+    old_rows = load_timetable_rows_cached() if event else None
+    with open_store(TIMETABLE_FILE, "w") as f:
         for row in rows:
             base = [
                 row.get("day", ""),
@@ -393,12 +501,15 @@ def save_timetable_rows(rows):
             if label:
                 base.append(label)
             f.write(",".join(base) + "\n")
+    publish_timetable_snapshots()
+    if event:
+        notify_timetable_change(event, old_rows, rows)
 
 
 def load_users():
     users = []
     if os.path.exists(USERS_FILE):
-        with open(USERS_FILE) as f:
+        with open_store(USERS_FILE) as f:
             for line in f:
                 parsed = parse_user_line(line)
                 if parsed:
@@ -406,8 +517,64 @@ def load_users():
     return users
 
 
+# Change notifications: outbox + delivery thread, created on first use so
+# the SQLite file only appears once something has changed.
+_notifier = {"dispatcher": None}
+_notifier_lock = threading.Lock()
+
+
+def notifier():
+    if _notifier["dispatcher"] is None:
+        with _notifier_lock:
+            if _notifier["dispatcher"] is None:
+                outbox = Outbox(NOTIFY_DB_FILE)
+                transports = create_transports(NOTIFY_TRANSPORTS, outbox, SMTP_HOST, SMTP_PORT, SMTP_SENDER)
+                _notifier["dispatcher"] = Dispatcher(
+                    outbox, transports, NOTIFY_BATCH_USERS, NOTIFY_COALESCE_SECONDS
+                )
+    return _notifier["dispatcher"]
+
+
+def notify_timetable_change(event, old_rows, new_rows):
+    # Enqueue one notification per affected user; delivery is asynchronous.
+    if not NOTIFY_TRANSPORTS:
+        return 0
+    users = [dict(u, department=user_department(u)) for u in load_users()]
+    targets = recipients(diff_timetables(old_rows, new_rows), users)
+    if not targets:
+        return 0
+    dispatcher = notifier()
+    try:
+        count = dispatcher.outbox.enqueue(event, targets)
+    except sqlite3.Error as e:
+        print("Notification enqueue failed:", e)
+        return 0
+    metrics.inc("smarttimetable_notifications_total", (("stage", "enqueued"),), count)
+    dispatcher.wake()
+    return count
+
+
+def resume_notifications():
+    # Items left pending by a previous run (restart, crash) go out without
+    # waiting for the next timetable change.
+    if not NOTIFY_TRANSPORTS or not os.path.exists(NOTIFY_DB_FILE):
+        return
+    try:
+        notifier().start()
+    except sqlite3.Error as e:
+        print("Notification resume failed:", e)
+
+
+def user_department(user):
+    # Students filed under "ALL" see their email's department (as on the dashboard).
+    department = user.get("department") or "ALL"
+    if user.get("role") == "student" and department.upper() == "ALL":
+        return infer_department_from_email(user.get("email", ""))
+    return department
+
+
 def save_users(users):
-    with open(USERS_FILE, "w") as f:
+    with open_store(USERS_FILE, "w") as f:
         for u in users:
             department = u.get("department", "ALL") or "ALL"
             profile_pic = u.get("profile_pic", "")
@@ -420,7 +587,7 @@ def save_users(users):
 def load_events():
     events = []
     if os.path.exists(EVENTS_FILE):
-        with open(EVENTS_FILE) as f:
+        with open_store(EVENTS_FILE) as f:
             for line in f:
                 line = line.strip()
                 if not line:
@@ -435,15 +602,149 @@ def load_events():
 
 
 def save_events(events):
-    with open(EVENTS_FILE, "w") as f:
+    with open_store(EVENTS_FILE, "w") as f:
         for e in events:
             f.write(json.dumps(e) + "\n")
 
 
+# Parsed stores for read-only views, re-read only when the file changes.
+# Callers must not mutate the returned lists/dicts.
+_store_cache = {}
+
+
+def load_store_cached(path, loader):
+    version = file_version(path)
+    entry = _store_cache.get(path)
+    if entry is None or entry[0] != version:
+        metrics.inc("smarttimetable_cache_requests_total", (("cache", "store"), ("result", "miss")))
+        entry = (version, loader())
+        _store_cache[path] = entry
+    else:
+        metrics.inc("smarttimetable_cache_requests_total", (("cache", "store"), ("result", "hit")))
+    return entry[1]
+
+
+def load_timetable_rows_cached():
+    return load_store_cached(TIMETABLE_FILE, load_timetable_rows)
+
+
+def load_events_cached():
+    return load_store_cached(EVENTS_FILE, load_events)
+
+
+# Teacher/room/department occupancy bitsets over the slot grid. Rebuilt when
+# another process rewrites one of its stores; edits made here update it in
+# place (see apply_timetable_update) and then re-stamp the version.
+_availability = {"version": None, "index": None}
+
+
+def availability_version():
+    return store_version(TIMETABLE_FILE, DATA_FILE, INSTITUTE_CONFIG_FILE)
+
+
+def load_availability():
+    version = availability_version()
+    if _availability["version"] != version:
+        _availability["index"] = build_index(
+            load_institute_config(), load_timetable_rows_cached(), load_courses()
+        )
+        _availability["version"] = version
+    return _availability["index"]
+
+
+def restamp_availability(index):
+    # After our own save: the index already reflects the new rows.
+    if _availability["index"] is index:
+        _availability["version"] = availability_version()
+
+
+def read_stores_stale():
+    for path in (TIMETABLE_FILE, EVENTS_FILE):
+        entry = _store_cache.get(path)
+        if entry is None or entry[0] != file_version(path):
+            return True
+    return snapshots_stale()
+
+
+def warm_read_stores():
+    load_timetable_rows_cached()
+    load_events_cached()
+    timetable_snapshots()
+
+
+# Static timetable snapshots (snapshots.py): published after every timetable
+# write, and again on first use whenever the timetable, users or slot grid
+# changed without us (another worker, a hand edit).
+_snapshots = {"manifest": None}
+_snapshots_lock = threading.Lock()
+SNAPSHOT_TITLES = {"institute": "Institute Timetable", "department": "{} Timetable", "teacher": "{}: Timetable"}
+
+
+def snapshot_source():
+    return store_version(TIMETABLE_FILE, USERS_FILE, INSTITUTE_CONFIG_FILE)
+
+
+def render_snapshot_html(scope, name, rows):
+    return app.jinja_env.get_template("timetable_snapshot.html").render(
+        scope=scope,
+        title=SNAPSHOT_TITLES[scope].format(name),
+        rows=rows
+    )
+
+
+def publish_timetable_snapshots():
+    with _snapshots_lock:
+        source = snapshot_source()
+        institute = load_institute_config()
+        day_order = {d: i for i, d in enumerate(institute["days"])}
+        slot_order = {s: i for i, s in enumerate(institute["slot_names"])}
+        rows = sorted(
+            load_timetable_rows_cached(),
+            key=lambda r: (
+                day_order.get(r["day"], 99),
+                slot_order.get(r["slot"], 99),
+                r["subject"],
+                r["target"],
+                r["teacher"],
+                r["room"]
+            )
+        )
+        departments = {user_department(u) for u in load_users() if u["role"] in ("student", "teacher")}
+        try:
+            manifest, written = publish_snapshots(SNAPSHOT_DIR, rows, render_snapshot_html, departments, source)
+        except OSError as e:
+            print("Snapshot publish failed:", e)
+            return None
+        metrics.inc("smarttimetable_snapshot_files_total", (), written)
+        _snapshots["manifest"] = manifest
+        return manifest
+
+
+def snapshots_stale():
+    manifest = _snapshots["manifest"]
+    return manifest is None or manifest["source"] != snapshot_source()
+
+
+def timetable_snapshots():
+    # Current manifest; another worker may already have published it.
+    if snapshots_stale():
+        manifest = load_snapshot_manifest(SNAPSHOT_DIR)
+        if manifest is None or manifest["source"] != snapshot_source():
+            return publish_timetable_snapshots()
+        _snapshots["manifest"] = manifest
+    return _snapshots["manifest"]
+
+
+def snapshot_url(entry, kind="json"):
+    if not entry:
+        return ""
+    return url_for("static", filename=f"snapshots/{entry[kind]}")
+
+
 def load_timetable_history():
     history = []
     if os.path.exists(TIMETABLE_HISTORY_FILE):
-        with open(TIMETABLE_HISTORY_FILE) as f:
+        with open_store(TIMETABLE_HISTORY_FILE) as f:
             for line in f:
                 line = line.strip()
                 if not line:
@@ -455,9 +756,52 @@ def load_timetable_history():
                 except json.JSONDecodeError:
                     continue
     history.sort(key=lambda x: x.get("generated_at", ""), reverse=True)
+    # Each run's predecessor, for "changes vs previous run".
+    for newer, older in zip(history, history[1:]):
+        newer["previous_id"] = older.get("id", "")
     return history
 
 
+def load_timetable_history_cached():
+    return load_store_cached(TIMETABLE_HISTORY_FILE, load_timetable_history)
+
+
+# Diffs between two timetables, cached per pair. A history run never changes
+# (key ("run", id)); the live timetable is keyed by its file version.
+_timetable_diffs = FragmentCache(max_entries=128)
+
+
+def timetable_snapshot(ref):
+    # "live" or a history run id -> (cache key, rows); None if unknown.
+    if ref == "live":
+        return ("live", file_version(TIMETABLE_FILE)), load_timetable_rows_cached()
+    for run in load_timetable_history_cached():
+        if run.get("id") == ref:
+            return ("run", ref), run.get("rows", [])
+    return None
+
+
+def timetable_diff(from_ref, to_ref):
+    """(diff, summary) from one timetable to another ("live" or a history run id), or None."""
+    old = timetable_snapshot(from_ref)
+    new = timetable_snapshot(to_ref)
+    if old is None or new is None:
+        return None
+    key = (old[0], new[0])
+    result = _timetable_diffs.get(key)
+    if result is None:
+        diff = diff_timetables(old[1], new[1])
+        result = (diff, summarize(diff))
+        _timetable_diffs.set(key, result)
+    return result
+
+
+@app.template_global("run_changes")
+def run_changes(from_ref, to_ref):
+    result = timetable_diff(from_ref, to_ref)
+    return result[1] if result else None
+
+
 def group_timetable_history_by_semester(history_rows):
     grouped_map = {}
     order = []
@@ -484,7 +828,7 @@ def group_timetable_history_by_semester(history_rows):
     return grouped
 
 
-def log_timetable_history(semester, generated_by, rows):
+def log_timetable_history(semester, generated_by, rows, metrics=None):
     record = {
         "id": str(uuid.uuid4()),
         "semester": semester,
@@ -494,9 +838,119 @@ def log_timetable_history(semester, generated_by, rows):
         "subjects": sorted(list({r.get("subject", "") for r in rows if r.get("subject", "")})),
         "rows": rows
     }
+    if metrics:
+        record["metrics"] = metrics
     append_line_safe(TIMETABLE_HISTORY_FILE, json.dumps(record))
 
 
+# Next-best timetables from the last generation, stored by the solver as
+# diffs against the optimum (timetable.write_alternatives).
+def load_timetable_alternatives():
+    if not os.path.exists(TIMETABLE_ALTERNATIVES_FILE):
+        return None
+    try:
+        with open_store(TIMETABLE_ALTERNATIVES_FILE) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def alternative_lines(alternatives, rank):
+    # Timetable lines of alternative `rank` (0 = the optimum).
+    if rank == 0:
+        return list(alternatives["rows"])
+    diff = alternatives["alternatives"][rank - 1]
+    removed = set(diff["removed"])
+    return [line for line in alternatives["rows"] if line not in removed] + diff["added"]
+
+
+def alternatives_summary():
+    alternatives = load_timetable_alternatives()
+    if not alternatives:
+        return None
+    current = []
+    if os.path.exists(TIMETABLE_FILE):
+        with open_store(TIMETABLE_FILE) as f:
+            current = [line.strip() for line in f if line.strip()]
+    active = alternatives.get("active", 0)
+    options = [{"rank": 0, "objective": alternatives["objective"], "delta": 0, "changed": 0, "subjects": []}]
+    for diff in alternatives["alternatives"]:
+        options.append({
+            "rank": diff["rank"],
+            "objective": diff["objective"],
+            "delta": diff["objective"] - alternatives["objective"],
+            "changed": len(diff["added"]),
+            "subjects": sorted({line.split(",")[2] for line in diff["added"]})
+        })
+    return {
+        "active": active,
+        "edited": current != alternative_lines(alternatives, active),
+        "options": options
+    }
+
+
+def build_teacher_cards(users, courses, timetable_rows):
+    # One grouped pass over courses and rows instead of re-filtering both
+    # lists for every teacher.
+    courses_by_teacher = {}
+    for c in courses:
+        courses_by_teacher.setdefault(c["teacher"], []).append(c)
+
+    class_counts = {}
+    absent_counts = {}
+    covered_counts = {}
+    for r in timetable_rows:
+        t = r.get("teacher", "")
+        class_counts[t] = class_counts.get(t, 0) + 1
+        label = r.get("label", "")
+        if label == ABSENT_LABEL:
+            absent_counts[t] = absent_counts.get(t, 0) + 1
+        elif label.startswith(SUBSTITUTE_PREFIX):
+            original = label[len(SUBSTITUTE_PREFIX):]
+            covered_counts[original] = covered_counts.get(original, 0) + 1
+
+    cards = []
+    for user in users:
+        if user["role"] != "teacher":
+            continue
+
+        teacher_name = user["name"]
+        timetable_count = class_counts.get(teacher_name, 0)
+        absent_count = absent_counts.get(teacher_name, 0)
+        covered_count = covered_counts.get(teacher_name, 0)
+        own_count = timetable_count + covered_count
+
+        cards.append({
+            "name": teacher_name,
+            "email": user["email"],
+            "department": user.get("department", "ALL"),
+            "profile_pic": user.get("profile_pic", ""),
+            "courses": courses_by_teacher.get(teacher_name, []),
+            "timetable_count": timetable_count,
+            "absent_count": absent_count,
+            "covered_count": covered_count,
+            "is_all_absent": own_count > 0 and absent_count + covered_count == own_count
+        })
+    return cards
+
+
+_teacher_cards_cache = {"version": None, "cards": []}
+
+
+def get_teacher_cards():
+    version = store_version(USERS_FILE, DATA_FILE, TIMETABLE_FILE)
+    hit = _teacher_cards_cache["version"] == version
+    metrics.inc(
+        "smarttimetable_cache_requests_total",
+        (("cache", "teacher_cards"), ("result", "hit" if hit else "miss"))
+    )
+    if not hit:
+        cards = build_teacher_cards(load_users(), load_courses(), load_timetable_rows())
+        _teacher_cards_cache["cards"] = cards
+        _teacher_cards_cache["version"] = version
+    return _teacher_cards_cache["cards"]
+
+
 def event_color(event_type):
     palette = {
         "exam": "#dc2626",
@@ -528,7 +982,7 @@ def to_calendar_event(event, viewer_email):
 def get_upcoming_vacations(limit=10):
     today = datetime.now().strftime("%Y-%m-%d")
     vacations = []
-    for e in load_events():
+    for e in load_events_cached():
         if e.get("type", "") == "vacation" and e.get("date", "") >= today:
             vacations.append(e)
     vacations.sort(key=lambda x: x.get("date", ""))
@@ -548,6 +1002,179 @@ def infer_department_from_email(email):
     return "ALL"
 
 
+def fragment_cache_stats():
+    yield ("smarttimetable_cache_requests_total", (("cache", "fragment"), ("result", "hit")), fragment_cache.hits)
+    yield ("smarttimetable_cache_requests_total", (("cache", "fragment"), ("result", "miss")), fragment_cache.misses)
+
+
+metrics.register_collector(fragment_cache_stats)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    forced = request.headers.get(PROFILE_HEADER) == "1" and session.get("role") == "admin"
+    if forced or PROFILE_SLOW_MS > 0:
+        g.profile_session = profiler.start(forced=forced)
+
+
+@app.after_request
+def finish_request_profile(response):
+    profile_session = g.pop("profile_session", None)
+    if profile_session is None:
+        return response
+    profiler.stop()
+    duration_ms = (time.perf_counter() - profile_session.started) * 1000
+    if profile_session.forced:
+        reason = "requested"
+    elif duration_ms >= PROFILE_SLOW_MS:
+        reason = "slow"
+    else:
+        return response
+    route = request.url_rule.rule if request.url_rule else request.path
+    record = profiler.save_profile(
+        PROFILE_DIR, profile_session, route, request.method,
+        duration_ms, response.status_code, reason,
+        max_files=PROFILE_MAX_FILES, max_age_s=PROFILE_MAX_AGE_DAYS * 86400
+    )
+    response.headers["X-Profile-File"] = record["file"]
+    return response
+
+
+@app.teardown_request
+def cleanup_request_profile(exc):
+    profiler.stop()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.inc(
+            "smarttimetable_http_requests_total",
+            (("route", route), ("method", request.method), ("status", str(response.status_code)))
+        )
+        metrics.observe(
+            "smarttimetable_http_request_duration_seconds",
+            (("route", route),),
+            time.perf_counter() - started
+        )
+    return response
+
+
+@app.template_global("store_version")
+def template_store_version(*names):
+    # Fragment cache key for {% cache %} blocks: changes whenever one of the
+    # named stores is rewritten.
+    return store_version(*(STORE_FILES[n] for n in names))
+
+
+@app.template_global("institute_config")
+def load_institute_config():
+    # Rooms, slot grid and priorities; cached until institute_config.json changes.
+    return load_config(INSTITUTE_CONFIG_FILE)
+
+
+def max_room_capacity():
+    return load_institute_config()["max_capacity"]
+
+
+@app.template_global("avatar_url")
+def avatar_url(profile_pic, size):
+    return url_for("static", filename=avatar_url_path(profile_pic, size))
+
+
+@app.after_request
+def cache_static_avatars(response):
+    # Content-addressed avatars and timetable snapshots never change under
+    # the same name.
+    if response.status_code == 200 and (
+        request.path.startswith("/static/profile_pics/") and is_content_addressed(request.path)
+        or request.path.startswith("/static/snapshots/") and is_snapshot_file(request.path)
+    ):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_CACHE_SECONDS
+        response.cache_control.immutable = True
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    accept = request.headers.get("Accept-Encoding", "").lower()
+    if (
+        response.direct_passthrough
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESS_MIMETYPES
+    ):
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    if brotli is not None and "br" in accept:
+        response.set_data(brotli.compress(body, quality=5))
+        response.headers["Content-Encoding"] = "br"
+    elif "gzip" in accept:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+# =====================================================
+# METRICS (PROMETHEUS)
+# =====================================================
+@app.route("/metrics")
+def metrics_endpoint():
+    if METRICS_TOKEN and request.headers.get("Authorization", "") != f"Bearer {METRICS_TOKEN}":
+        return "Unauthorized", 401
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+# =====================================================
+# ADMIN REQUEST PROFILES
+# =====================================================
+@app.route("/admin/profiles")
+def admin_profiles():
+    if session.get("role") != "admin":
+        return redirect("/login")
+
+    selected = request.args.get("file", "")
+    records = profiler.load_profile_index(PROFILE_DIR)
+    summary = None
+    if selected and any(r["file"] == selected for r in records):
+        summary = profiler.summarize_profile(PROFILE_DIR, selected, PROJECT_PY_FILES)
+    else:
+        selected = ""
+
+    return render_template(
+        "admin_profiles.html",
+        records=records,
+        selected=selected,
+        summary=summary,
+        slow_ms=PROFILE_SLOW_MS,
+        header_name=PROFILE_HEADER
+    )
+
+
+@app.route("/admin/profiles/download")
+def download_profile():
+    if session.get("role") != "admin":
+        return "Unauthorized", 401
+    name = request.args.get("file", "")
+    if not any(r["file"] == name for r in profiler.load_profile_index(PROFILE_DIR, limit=10000)):
+        return "Profile not found", 404
+    return send_from_directory(PROFILE_DIR, name, as_attachment=True, mimetype="text/plain")
+
+
 # =====================================================
 # HOME → REDIRECT TO LOGIN
 # =====================================================
@@ -577,7 +1204,7 @@ def login():
     if not os.path.exists(USERS_FILE):
         return redirect("/login?error=No+users+found.+Admin+must+create+accounts.")
 
-    with open(USERS_FILE) as f:
+    with open_store(USERS_FILE) as f:
         for line in f:
             user = parse_user_line(line)
             if not user:
@@ -588,6 +1215,10 @@ def login():
                 and user["role"] == role
                 and check_password_hash(user["hash"], password)
             ):
+                # Fresh id on login: a planted or pre-login session id must
+                # not become an authenticated one.
+                session.clear()
+                session.rotate()
                 session["email"] = user["email"]
                 session["role"] = user["role"]
                 session["name"] = user["name"]
@@ -626,14 +1257,14 @@ def signup():
         return redirect("/login?error=All+signup+fields+are+required.")
 
     if os.path.exists(USERS_FILE):
-        with open(USERS_FILE) as f:
+        with open_store(USERS_FILE) as f:
             for line in f:
                 user = parse_user_line(line)
                 if user and user["email"] == email and user["role"] == role:
                     return redirect("/login?error=Account+already+exists.+Please+login.")
 
     if os.path.exists(PENDING_FILE):
-        with open(PENDING_FILE) as f:
+        with open_store(PENDING_FILE) as f:
             for line in f:
                 pending = parse_pending_line(line)
                 if pending and pending["email"] == email and pending["role"] == role:
@@ -676,26 +1307,28 @@ def admin_dashboard():
     admin_events = load_events()
     admin_events.sort(key=lambda x: x.get("date", ""))
     vacations = [e for e in admin_events if e.get("type", "") == "vacation"]
-    users = load_users()
     courses = load_courses()
-    teacher_cards = []
+    teacher_cards = get_teacher_cards()
+    availability = load_availability()
+    for row in timetable_rows:
+        row["conflicts"] = availability.row_conflicts(row)
 
     if os.path.exists(PENDING_FILE):
-        with open(PENDING_FILE) as f:
+        with open_store(PENDING_FILE) as f:
             for line in f:
                 parsed = parse_pending_line(line)
                 if parsed:
                     pending.append(parsed)
 
     if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE) as f:
+        with open_store(HISTORY_FILE) as f:
             for line in f:
                 parsed = parse_history_line(line)
                 if parsed:
                     history.append(parsed)
 
     if os.path.exists(PREFERENCE_HISTORY_FILE):
-        with open(PREFERENCE_HISTORY_FILE) as f:
+        with open_store(PREFERENCE_HISTORY_FILE) as f:
             for line in f:
                 parsed = parse_preference_history_line(line)
                 if parsed:
@@ -704,26 +1337,6 @@ def admin_dashboard():
     history.reverse()
     preference_history.reverse()
 
-    for user in users:
-        if user["role"] != "teacher":
-            continue
-
-        teacher_name = user["name"]
-        teacher_courses = [c for c in courses if c["teacher"] == teacher_name]
-        teacher_rows = [r for r in timetable_rows if r.get("teacher", "") == teacher_name]
-        absent_count = len([r for r in teacher_rows if r.get("label", "") == "Teacher Absent"])
-
-        teacher_cards.append({
-            "name": teacher_name,
-            "email": user["email"],
-            "department": user.get("department", "ALL"),
-            "profile_pic": user.get("profile_pic", ""),
-            "courses": teacher_courses,
-            "timetable_count": len(teacher_rows),
-            "absent_count": absent_count,
-            "is_all_absent": len(teacher_rows) > 0 and absent_count == len(teacher_rows)
-        })
-
     return render_template(
         "admin.html",
         pending=pending,
@@ -731,6 +1344,7 @@ def admin_dashboard():
         preference_requests=preference_requests,
         preference_history=preference_history,
         timetable_rows=timetable_rows,
+        timetable_conflict_count=sum(1 for row in timetable_rows if row["conflicts"]),
         timetable_history=timetable_history,
         timetable_history_grouped=timetable_history_grouped,
         approved_courses_count=len(courses),
@@ -739,6 +1353,10 @@ def admin_dashboard():
         default_semester_key=default_semester_key,
         default_semester_year=default_semester_year,
         teacher_cards=teacher_cards,
+        generation_diagnosis=session.pop("generation_diagnosis", []),
+        timetable_alternatives=alternatives_summary(),
+        max_alternatives=MAX_ALTERNATIVES,
+        institute_form=config_form_values(load_institute_config()),
         admin_events=admin_events,
         vacations=vacations,
         admin_name=session.get("name", "Admin"),
@@ -766,7 +1384,7 @@ def approve_teacher():
     remaining = []
 
     if os.path.exists(PENDING_FILE):
-        with open(PENDING_FILE) as f:
+        with open_store(PENDING_FILE) as f:
             for line in f:
                 pending = parse_pending_line(line)
                 if not pending:
@@ -776,7 +1394,7 @@ def approve_teacher():
                 else:
                     remaining.append(line)
 
-        with open(PENDING_FILE, "w") as f:
+        with open_store(PENDING_FILE, "w") as f:
             f.writelines(remaining)
 
     if not approved:
@@ -789,6 +1407,7 @@ def approve_teacher():
             f"{approved['name']},{approved['department']}"
         )
     )
+    session_backend.invalidate_user(approved["email"])
     log_admin_action("approved", approved)
     return redirect("/admin/dashboard")
 
@@ -808,7 +1427,7 @@ def reject_teacher():
 
     if os.path.exists(PENDING_FILE):
         remaining = []
-        with open(PENDING_FILE) as f:
+        with open_store(PENDING_FILE) as f:
             for line in f:
                 pending = parse_pending_line(line)
                 if not pending:
@@ -823,7 +1442,7 @@ def reject_teacher():
                 else:
                     remaining.append(line)
 
-        with open(PENDING_FILE, "w") as f:
+        with open_store(PENDING_FILE, "w") as f:
             f.writelines(remaining)
 
     if rejected:
@@ -856,9 +1475,9 @@ def approve_preference():
         return redirect("/admin/dashboard?section=preferences-section")
 
     try:
-        if int(approved["students"]) > MAX_ROOM_CAPACITY:
+        if int(approved["students"]) > max_room_capacity():
             return redirect(
-                "/admin/dashboard?error=Cannot+approve:+students+exceed+max+room+capacity+(50).+Please+edit+request.&section=preferences-section"
+                f"/admin/dashboard?error=Cannot+approve:+students+exceed+max+room+capacity+({max_room_capacity()}).+Please+edit+request.&section=preferences-section"
             )
     except ValueError:
         return redirect("/admin/dashboard?error=Invalid+students+count+in+request.&section=preferences-section")
@@ -943,9 +1562,9 @@ def edit_preference():
         target_req["students"] = request.form.get("students", "").strip()
         target_req["target"] = request.form.get("target", "ALL").strip() or "ALL"
         try:
-            if int(target_req["students"]) > MAX_ROOM_CAPACITY:
+            if int(target_req["students"]) > max_room_capacity():
                 return redirect(
-                    f"/admin/preferences/edit?id={request_id}&error=Students+exceed+max+room+capacity+(50)."
+                    f"/admin/preferences/edit?id={request_id}&error=Students+exceed+max+room+capacity+({max_room_capacity()})."
                 )
         except ValueError:
             return redirect(f"/admin/preferences/edit?id={request_id}&error=Invalid+students+count.")
@@ -994,16 +1613,63 @@ def generate():
     semester_year = request.form.get("semester_year", "").strip() or str(datetime.now().year)
     if not semester:
         semester = build_semester_label(semester_key, semester_year)
-    ok, msg = timetable.run()
+    try:
+        alternatives = min(max(int(request.form.get("alternatives", "0")), 0), MAX_ALTERNATIVES)
+    except ValueError:
+        alternatives = 0
+    old_rows = load_timetable_rows()
+    started = time.perf_counter()
+    ok, msg, run_metrics = generation_service.run_generation(alternatives=alternatives)
+    metrics.inc("smarttimetable_solver_jobs_total", (("result", "ok" if ok else "failed"),))
+    metrics.observe(
+        "smarttimetable_solver_duration_seconds",
+        (),
+        time.perf_counter() - started,
+        buckets=metrics.SOLVER_BUCKETS
+    )
     if ok:
         rows = load_timetable_rows()
         log_timetable_history(
             semester=semester,
             generated_by=session.get("email", "admin"),
-            rows=rows
+            rows=rows,
+            metrics=run_metrics
         )
+        publish_timetable_snapshots()
+        notify_timetable_change("Timetable regenerated", old_rows, rows)
         return redirect("/admin/dashboard?message=Timetable+generated+successfully.")
-    return redirect("/admin/dashboard?error=" + msg.replace(" ", "+"))
+    # Shown as a persistent card in the Generate section (notices fade out).
+    session["generation_diagnosis"] = run_metrics.get("diagnosis", [])
+    return redirect(url_for("admin_dashboard", error=msg))
+
+
+@app.route("/admin/timetable/alternative", methods=["POST"])
+def switch_timetable_alternative():
+
+    if session.get("role") != "admin":
+        return "Unauthorized"
+
+    alternatives = load_timetable_alternatives()
+    try:
+        rank = int(request.form.get("rank", ""))
+    except ValueError:
+        rank = -1
+    if not alternatives or not 0 <= rank <= len(alternatives["alternatives"]):
+        return redirect("/admin/dashboard?section=generate-section&error=Timetable+alternative+not+found.")
+
+    index = load_availability()
+    with index.lock:
+        old_rows = load_timetable_rows()
+        with open_store(TIMETABLE_FILE, "w") as f:
+            for line in alternative_lines(alternatives, rank):
+                f.write(line + "\n")
+        alternatives["active"] = rank
+        with open_store(TIMETABLE_ALTERNATIVES_FILE, "w") as f:
+            json.dump(alternatives, f)
+    publish_timetable_snapshots()
+    notify_timetable_change("Timetable switched to an alternative", old_rows, load_timetable_rows())
+    label = "optimum" if rank == 0 else f"alternative+{rank}"
+    return redirect(f"/admin/dashboard?section=generate-section&message=Timetable+{label}+applied.")
 
 
 @app.route("/admin/timetable/delete")
@@ -1075,7 +1741,9 @@ def label_timetable_absent():
             row["label"] = "" if clear else "Teacher Absent"
             updated = True
 
-    save_timetable_rows(rows)
+    index = load_availability()   # labels don't move occupancy
+    save_timetable_rows(rows, "Class label cleared" if clear else "Teacher absent for a class")
+    restamp_availability(index)
     if clear:
         return redirect("/admin/dashboard?message=Timetable+label+cleared.")
     return redirect("/admin/dashboard?message=Absent+label+added.")
@@ -1130,7 +1798,7 @@ def edit_timetable_entry():
             "target": new_target,
             "label": new_label
         }
-        updated = apply_timetable_update(
+        updated, conflicts = apply_timetable_update(
             {
                 "day": old_day,
                 "slot": old_slot,
@@ -1143,12 +1811,24 @@ def edit_timetable_entry():
         )
         if not updated:
             return redirect("/admin/dashboard?error=Timetable+entry+not+found.&section=" + source_section)
+        blocking = [c["message"] for c in conflicts if c["blocking"]]
+        if blocking:
+            return redirect(url_for("admin_dashboard", error="Not saved: " + " ".join(blocking), section=source_section))
+        if conflicts:
+            message = "Timetable entry updated. Warning: " + " ".join(c["message"] for c in conflicts)
+            return redirect(url_for("admin_dashboard", message=message, section=source_section))
 
         return redirect("/admin/dashboard?message=Timetable+entry+updated.&section=" + source_section)
 
+    availability = load_availability()
+    class_size = availability.size_of(target_row) or 0
     return render_template(
         "admin_edit_timetable.html",
         row=target_row,
+        class_size=class_size,
+        suggestions=availability.free_slots(
+            target_row.get("teacher", ""), target_row.get("target", "ALL"), class_size, target_row
+        ),
         old_day=old_day,
         old_slot=old_slot,
         old_subject=old_subject,
@@ -1183,10 +1863,88 @@ def update_timetable_entry_api():
         "label": request.form.get("label", "").strip()
     }
 
-    updated = apply_timetable_update(old_row, new_row)
+    updated, conflicts = apply_timetable_update(old_row, new_row)
     if not updated:
         return jsonify({"ok": False, "error": "Entry not found"}), 404
-    return jsonify({"ok": True, "row": new_row})
+    blocking = [c for c in conflicts if c["blocking"]]
+    if blocking:
+        return jsonify({
+            "ok": False,
+            "error": " ".join(c["message"] for c in blocking),
+            "conflicts": conflicts
+        }), 409
+    return jsonify({"ok": True, "row": new_row, "conflicts": conflicts})
+
+
+def edited_row_from_args(args):
+    # old_* query args identify the row being edited, whose own slot/room
+    # should count as free; None when not editing.
+    if not args.get("old_day"):
+        return None
+    return {
+        "day": args.get("old_day", "").strip(),
+        "slot": args.get("old_slot", "").strip(),
+        "subject": args.get("old_subject", "").strip(),
+        "room": args.get("old_room", "").strip(),
+        "teacher": args.get("old_teacher", "").strip(),
+        "target": args.get("old_target", "").strip() or "ALL"
+    }
+
+
+@app.route("/admin/timetable/free_rooms_api")
+def free_rooms_api():
+    if session.get("role") != "admin":
+        return jsonify({"ok": False, "error": "Unauthorized"}), 401
+    try:
+        capacity = int(request.args.get("capacity", "0") or 0)
+    except ValueError:
+        return jsonify({"ok": False, "error": "capacity must be a number"}), 400
+
+    day = request.args.get("day", "").strip()
+    slot = request.args.get("slot", "").strip()
+    rooms = load_availability().free_rooms(day, slot, capacity, edited_row_from_args(request.args))
+    return jsonify({"ok": True, "day": day, "slot": slot, "capacity": capacity, "rooms": rooms})
+
+
+@app.route("/admin/timetable/free_slots_api")
+def free_slots_api():
+    if session.get("role") != "admin":
+        return jsonify({"ok": False, "error": "Unauthorized"}), 401
+    try:
+        capacity = int(request.args.get("capacity", "0") or 0)
+    except ValueError:
+        return jsonify({"ok": False, "error": "capacity must be a number"}), 400
+
+    teacher = request.args.get("teacher", "").strip()
+    target = request.args.get("target", "").strip() or "ALL"
+    slots = load_availability().free_slots(teacher, target, capacity, edited_row_from_args(request.args))
+    return jsonify({"ok": True, "teacher": teacher, "target": target, "capacity": capacity, "slots": slots})
+
+
+@app.route("/admin/timetable/diff_api")
+def timetable_diff_api():
+    # ?from=<run id>&to=<run id or live>; defaults: latest run -> live.
+    if session.get("role") != "admin":
+        return jsonify({"ok": False, "error": "Unauthorized"}), 401
+    history = load_timetable_history_cached()
+    from_ref = request.args.get("from", "").strip() or (history[0].get("id", "") if history else "")
+    to_ref = request.args.get("to", "").strip() or "live"
+    result = timetable_diff(from_ref, to_ref)
+    if result is None:
+        return jsonify({"ok": False, "error": "Unknown generation run"}), 404
+
+    diff, summary = result
+    payload = {"ok": True, "from": from_ref, "to": to_ref, "summary": summary}
+    if request.args.get("detail") == "1":
+        payload["changes"] = diff
+    return jsonify(payload)
+
+
+@app.route("/admin/teachers_api")
+def teacher_cards_api():
+    if session.get("role") != "admin":
+        return jsonify({"ok": False, "error": "Unauthorized"}), 401
+    return jsonify({"ok": True, "teachers": get_teacher_cards()})
 
 
 @app.route("/admin/timetable/teacher_absent")
@@ -1197,26 +1955,96 @@ def mark_teacher_all_absent():
 
     teacher = request.args.get("teacher", "")
     clear = request.args.get("clear", "0") == "1"
-    rows = load_timetable_rows()
-    updated = 0
+    index = load_availability()
+    with index.lock:
+        rows = load_timetable_rows()
+        updated = 0
 
-    for row in rows:
-        if row.get("teacher", "") == teacher:
-            if clear:
-                if row.get("label", "") == "Teacher Absent":
-                    row["label"] = ""
-                    updated += 1
-            else:
-                if row.get("label", "") != "Teacher Absent":
-                    row["label"] = "Teacher Absent"
-                    updated += 1
+        for row in rows:
+            if clear and row.get("label", "") == SUBSTITUTE_PREFIX + teacher:
+                # Hand substituted classes back to the teacher.
+                index.remove(row)
+                row["teacher"] = teacher
+                row["label"] = ""
+                index.add(row)
+                updated += 1
+            elif row.get("teacher", "") == teacher:
+                if clear:
+                    if row.get("label", "") == ABSENT_LABEL:
+                        row["label"] = ""
+                        updated += 1
+                else:
+                    if row.get("label", "") != ABSENT_LABEL:
+                        row["label"] = ABSENT_LABEL
+                        updated += 1
 
-    save_timetable_rows(rows)
+        save_timetable_rows(rows, "Teacher absence cleared" if clear else "Teacher absent")
+        restamp_availability(index)
     if clear:
         return redirect("/admin/dashboard?message=Teacher+absence+cleared+for+all+classes.")
     return redirect("/admin/dashboard?message=Teacher+marked+absent+for+all+classes.")
 
 
+def absent_rows(rows, teacher="", day=""):
+    return [
+        r for r in rows
+        if r.get("label", "") == ABSENT_LABEL
+        and (not teacher or r.get("teacher", "") == teacher)
+        and (not day or r.get("day", "") == day)
+    ]
+
+
+def assign_substitutes(teacher="", day="", apply=False):
+    # Proposals for the matching "Teacher Absent" rows; with apply=True the
+    # chosen substitutes are written to the timetable.
+    index = load_availability()
+    with index.lock:
+        rows = load_timetable_rows()
+        proposals = propose_substitutes(
+            index, rows, absent_rows(rows, teacher, day), load_courses(), load_users()
+        )
+        if apply and any(p["substitute"] for p in proposals):
+            for p in proposals:
+                if p["substitute"]:
+                    new_row = substituted_row(p["row"], p["substitute"])
+                    index.remove(p["row"])
+                    index.add(new_row)
+                    p["row"].update(new_row)
+            save_timetable_rows(rows, "Substitute teachers assigned")
+            restamp_availability(index)
+    return proposals
+
+
+@app.route("/admin/timetable/substitutes_api")
+def substitutes_api():
+    if session.get("role") != "admin":
+        return jsonify({"ok": False, "error": "Unauthorized"}), 401
+
+    proposals = assign_substitutes(
+        request.args.get("teacher", "").strip(),
+        request.args.get("day", "").strip()
+    )
+    return jsonify({"ok": True, "proposals": proposals})
+
+
+@app.route("/admin/timetable/assign_substitutes")
+def assign_substitutes_route():
+
+    if session.get("role") != "admin":
+        return "Unauthorized"
+
+    proposals = assign_substitutes(
+        request.args.get("teacher", ""),
+        request.args.get("day", ""),
+        apply=True
+    )
+    covered = sum(1 for p in proposals if p["substitute"])
+    if not proposals:
+        return redirect("/admin/dashboard?error=No+absent+classes+to+cover.&section=dashboard-section")
+    message = f"Substitutes assigned for {covered} of {len(proposals)} absent classes."
+    return redirect(url_for("admin_dashboard", message=message, section="dashboard-section"))
+
+
 @app.route("/events")
 def events():
     role = session.get("role")
@@ -1224,11 +2052,62 @@ def events():
     if role not in ("admin", "teacher", "student"):
         return jsonify([])
 
-    all_events = load_events()
+    all_events = load_events_cached()
     payload = [to_calendar_event(e, email) for e in all_events]
     return jsonify(payload)
 
 
+@app.route("/notifications")
+def notifications_api():
+    # Recent in-app timetable change digests for the logged-in user.
+    if session.get("role") not in ("admin", "teacher", "student") or "inapp" not in NOTIFY_TRANSPORTS:
+        return jsonify([])
+    return jsonify(notifier().outbox.inbox(session.get("email", "")))
+
+
+def notification_stream_start():
+    # (email, last seen inbox id) for the logged-in user's change stream, or
+    # None. Without Last-Event-ID the stream starts at "now".
+    if session.get("role") not in ("admin", "teacher", "student") or "inapp" not in NOTIFY_TRANSPORTS:
+        return None
+    email = session.get("email", "")
+    try:
+        after_id = int(request.headers.get("Last-Event-ID", ""))
+    except ValueError:
+        after_id = notifier().outbox.latest_inbox_id(email)
+    return email, after_id
+
+
+def notification_frames(email, after_id):
+    # SSE frames for digests newer than after_id, plus the new last id.
+    frames = []
+    for item in notifier().outbox.inbox(email, after_id):
+        after_id = item["id"]
+        frames.append(f"id: {item['id']}\ndata: {json.dumps(item)}\n\n")
+    frames.append(": keep-alive\n\n")
+    return "".join(frames), after_id
+
+
+@app.route("/notifications/stream")
+def notifications_stream():
+    # Server-sent events: new digests as they are delivered. The ASGI entry
+    # point serves this route on the event loop (asgi.py); this version holds
+    # a thread for the connection's lifetime.
+    start = notification_stream_start()
+    if start is None:
+        return Response(status=204)
+
+    def stream(email, after_id):
+        yield f"retry: {NOTIFY_POLL_SECONDS * 1000}\n\n"
+        deadline = time.monotonic() + NOTIFY_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            frames, after_id = notification_frames(email, after_id)
+            yield frames
+            time.sleep(NOTIFY_POLL_SECONDS)
+
+    return Response(stream(*start), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 @app.route("/teacher/add_event", methods=["POST"])
 def add_teacher_event():
     if session.get("role") != "teacher":
@@ -1402,6 +2281,21 @@ def admin_edit_event():
     return render_template("admin_edit_event.html", event=target)
 
 
+# =====================================================
+# INSTITUTE SETUP (ROOMS / SLOTS / PRIORITIES)
+# =====================================================
+@app.route("/admin/institute", methods=["POST"])
+def admin_update_institute():
+    if session.get("role") != "admin":
+        return "Unauthorized"
+
+    try:
+        save_config(INSTITUTE_CONFIG_FILE, parse_config_form(request.form))
+    except ConfigError as e:
+        return redirect(url_for("admin_dashboard", error=str(e), section="institute-section"))
+    return redirect("/admin/dashboard?message=Institute+setup+saved.&section=institute-section")
+
+
 # =====================================================
 # TEACHER DASHBOARD
 # =====================================================
@@ -1414,7 +2308,7 @@ def teacher_dashboard():
     teacher = session["name"]
     rows = []
     pending_rows = []
-    institute_timetable = load_timetable_rows()
+    institute_timetable = load_timetable_rows_cached()
     my_timetable = []
     today_short = datetime.now().strftime("%a")
     today_name = datetime.now().strftime("%A")
@@ -1466,8 +2360,8 @@ def submit_teacher():
     students = request.form["students"]
     target = request.form.get("target", "ALL").strip() or "ALL"
     try:
-        if int(students) > MAX_ROOM_CAPACITY:
-            return "Students count exceeds max room capacity (50). Please split into multiple batches."
+        if int(students) > max_room_capacity():
+            return f"Students count exceeds max room capacity ({max_room_capacity()}). Please split into multiple batches."
     except ValueError:
         return "Invalid students count."
 
@@ -1518,36 +2412,14 @@ def student_dashboard():
     if not student_department or student_department.upper() == "ALL":
         student_department = infer_department_from_email(session.get("email", ""))
 
-    institute_timetable = load_timetable_rows()
-    my_timetable = []
-    institute_today = []
-    my_today = []
-    today_short = datetime.now().strftime("%a")
-    today_name = datetime.now().strftime("%A")
-    day_order = {"Mon": 1, "Tue": 2, "Wed": 3, "Thu": 4, "Fri": 5}
-    slot_order = {"S1": 1, "S2": 2, "S3": 3, "S4": 4}
-
-    for row in institute_timetable:
-        if row["day"] == today_short:
-            institute_today.append(row)
-
-    for row in institute_timetable:
-        target = row["target"].strip().upper()
-        dept = student_department.strip().upper()
-        if target == "ALL" or dept == "ALL" or target == dept:
-            my_timetable.append(row)
-            if row["day"] == today_short:
-                my_today.append(row)
-
-    my_timetable.sort(
-        key=lambda r: (
-            day_order.get(r["day"], 99),
-            slot_order.get(r["slot"], 99),
-            r["subject"]
-        )
-    )
-    my_today.sort(key=lambda r: (slot_order.get(r["slot"], 99), r["subject"]))
-    institute_today.sort(key=lambda r: (slot_order.get(r["slot"], 99), r["subject"]))
+    # Personalized shell only: the timetables are static snapshots the
+    # browser (or front proxy) fetches from /static/snapshots/.
+    snapshots = timetable_snapshots() or {"institute": None, "departments": {}}
+    institute_snapshot = snapshots["institute"]
+    if student_department.upper() == "ALL":
+        my_snapshot = institute_snapshot
+    else:
+        my_snapshot = snapshots["departments"].get(student_department.upper())
 
     return render_template(
         "student_dashboard.html",
@@ -1555,12 +2427,12 @@ def student_dashboard():
         student_email=session.get("email", ""),
         student_department=student_department,
         student_profile_pic=session.get("profile_pic", ""),
-        institute_timetable=institute_timetable,
-        my_timetable=my_timetable,
-        my_today=my_today,
-        institute_today=institute_today,
+        my_snapshot_url=snapshot_url(my_snapshot),
+        institute_snapshot_url=snapshot_url(institute_snapshot),
+        my_class_count=my_snapshot["classes"] if my_snapshot else 0,
         vacations=get_upcoming_vacations(),
-        today_name=today_name
+        today_name=datetime.now().strftime("%A"),
+        today_short=datetime.now().strftime("%a")
     )
 
 
@@ -1570,21 +2442,15 @@ def student_timetable():
     if session.get("role") != "student":
         return redirect("/login")
 
-    timetable_data = []
-
-    if os.path.exists(TIMETABLE_FILE):
-        with open(TIMETABLE_FILE) as f:
-            for line in f:
-                parts = line.strip().split(",")
-                if len(parts) < 4:
-                    continue
-                day, slot, subject, room = parts[0], parts[1], parts[2], parts[3]
-                timetable_data.append({
-                    "day": day,
-                    "slot": slot,
-                    "subject": subject,
-                    "room": room
-                })
+    timetable_data = [
+        {
+            "day": row["day"],
+            "slot": row["slot"],
+            "subject": row["subject"],
+            "room": row["room"]
+        }
+        for row in load_timetable_rows_cached()
+    ]
 
     return render_template(
         "student_timetable.html",
@@ -1644,30 +2510,38 @@ def update_profile():
     if role == "admin":
         department = "ALL"
 
-    if name:
-        target["name"] = name
-        session["name"] = name
-
-    target["department"] = department
-    session["department"] = department
-
+    old_pic = target.get("profile_pic", "")
     file = request.files.get("profile_pic")
     if file and file.filename:
         ext = os.path.splitext(file.filename)[1].lower()
         if ext in ALLOWED_IMAGE_EXT:
-            os.makedirs(PROFILE_UPLOAD_DIR, exist_ok=True)
-            safe_email = secure_filename(email.replace("@", "_at_"))
-            filename = f"{role}_{safe_email}_{int(datetime.now().timestamp())}{ext}"
-            file_path = os.path.join(PROFILE_UPLOAD_DIR, filename)
-            file.save(file_path)
-            rel_path = f"profile_pics/{filename}"
+            try:
+                rel_path = save_avatar(file.read(), ext, PROFILE_UPLOAD_DIR)
+            except AvatarError as e:
+                return redirect("/profile?error=" + str(e).replace(" ", "+"))
             target["profile_pic"] = rel_path
             session["profile_pic"] = rel_path
 
+    if name:
+        target["name"] = name
+        session["name"] = name
+
+    target["department"] = department
+    session["department"] = department
+
     save_users(users)
+    # Other devices logged in as this user still hold the old name/department.
+    session_backend.invalidate_user(email, keep_sid=session.sid)
+    if target.get("profile_pic", "") != old_pic:
+        # Only the replaced avatar's own files, and only if nobody else uses
+        # them (re-read: another upload may have been saved meanwhile).
+        remove_replaced_avatar(PROFILE_UPLOAD_DIR, old_pic, [u.get("profile_pic", "") for u in load_users()])
     return redirect("/profile?message=Profile+updated+successfully.")
 
 
+resume_notifications()
+
+
 # =====================================================
 # RUN
 # =====================================================
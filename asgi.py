@@ -0,0 +1,173 @@
+"""ASGI entry point for high-concurrency student traffic.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+Read-only student routes are served on the event loop: the text stores they
+need are cached in-process and only re-read (in a worker thread) when the
+file changes. That is only safe while the view does no blocking I/O, so it
+applies with the in-memory session backend (SQLite sessions read and write
+the database) and only when the stores and timetable snapshots are current,
+re-checked right before the call; otherwise the view runs in the thread
+pool like any other route. The change
+notification stream (/notifications/stream) is served natively: chunks are
+sent as they come and the wait between polls is an asyncio.sleep, so an
+open dashboard holds no thread either. Every other route, including all
+admin writes, runs through the normal sync Flask app in the thread pool.
+"""
+import asyncio
+import io
+import sys
+import time
+
+import app as webapp
+
+
+ASYNC_READ_ROUTES = {
+    "/student/dashboard",
+    "/student/timetable",
+    "/events"
+}
+INLINE_READS = webapp.SESSION_BACKEND == "memory"
+
+
+def build_environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/" + scope.get("http_version", "1.1"),
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1")
+        value = raw_value.decode("latin-1")
+        if name == "content-type":
+            environ["CONTENT_TYPE"] = value
+        elif name == "content-length":
+            environ["CONTENT_LENGTH"] = value
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+            environ[key] = environ[key] + "," + value if key in environ else value
+    return environ
+
+
+def call_wsgi(environ):
+    status_headers = {}
+
+    def start_response(status, headers, exc_info=None):
+        status_headers["status"] = int(status.split(" ", 1)[0])
+        status_headers["headers"] = headers
+
+    result = webapp.app.wsgi_app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return status_headers["status"], status_headers["headers"], body
+
+
+async def read_body(receive):
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    return b"".join(chunks)
+
+
+async def send_response(send, status, headers, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (k.lower().encode("latin-1"), v.encode("latin-1"))
+            for k, v in headers
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def notification_stream(environ, send):
+    def start():
+        # Opens the Flask session to identify the user; no view runs.
+        with webapp.app.request_context(environ):
+            return webapp.notification_stream_start()
+
+    stream = await asyncio.to_thread(start)
+    if stream is None:
+        await send_response(send, 204, [], b"")
+        return
+    email, after_id = stream
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream; charset=utf-8"), (b"cache-control", b"no-cache")]
+    })
+    try:
+        chunk = f"retry: {webapp.NOTIFY_POLL_SECONDS * 1000}\n\n"
+        deadline = time.monotonic() + webapp.NOTIFY_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            frames, after_id = await asyncio.to_thread(webapp.notification_frames, email, after_id)
+            await send({"type": "http.response.body", "body": (chunk + frames).encode("utf-8"), "more_body": True})
+            chunk = ""
+            await asyncio.sleep(webapp.NOTIFY_POLL_SECONDS)
+        await send({"type": "http.response.body", "body": b""})
+    except OSError:
+        pass   # client went away
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await asyncio.to_thread(webapp.warm_read_stores)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    body = await read_body(receive)
+    environ = build_environ(scope, body)
+
+    if scope["method"] == "GET" and scope["path"] == "/notifications/stream":
+        await notification_stream(environ, send)
+        return
+
+    if INLINE_READS and scope["method"] in ("GET", "HEAD") and scope["path"] in ASYNC_READ_ROUTES:
+        # Only touch the disk off-loop. A write landing after the warm-up
+        # would make the view re-read the store or republish snapshots, so
+        # re-check (a few stats) before running it inline.
+        if webapp.read_stores_stale():
+            await asyncio.to_thread(webapp.warm_read_stores)
+        if webapp.read_stores_stale():
+            status, headers, payload = await asyncio.to_thread(call_wsgi, environ)
+        else:
+            status, headers, payload = call_wsgi(environ)
+    else:
+        status, headers, payload = await asyncio.to_thread(call_wsgi, environ)
+
+    await send_response(send, status, headers, payload)
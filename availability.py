@@ -0,0 +1,238 @@
+import threading
+from bisect import bisect_left
+
+
+# -----------------------------
+# Availability Index
+# -----------------------------
+# Occupancy of every teacher, room and department as an int bitset over the
+# institute slot grid (bit i = config["slots"][i]), so "is T1 free on Mon S2"
+# is a dict lookup and an AND instead of a scan over timetable_output.txt.
+# A generated timetable has at most one row per teacher/room cell; rows beyond
+# the first (existing clashes) are counted in _extra so removals stay exact.
+#
+# Department rows: target "ALL" occupies every department at that slot.
+
+BLOCKING = {"slot", "teacher", "room", "capacity"}   # rejected on save
+KINDS = ("teacher", "room", "department", "slot")
+
+
+def _conflict(kind, message):
+    return {"kind": kind, "message": message, "blocking": kind in BLOCKING}
+
+
+def course_sizes(courses):
+    sizes = {}
+    for c in courses:
+        try:
+            students = int(c.get("students", 0))
+        except (TypeError, ValueError):
+            continue
+        sizes[(c.get("subject", ""), c.get("teacher", ""), c.get("target", "ALL"))] = students
+    return sizes
+
+
+class AvailabilityIndex:
+
+    def __init__(self, config, sizes):
+        self.slots = [tuple(s.rsplit("_", 1)) for s in config["slots"]]
+        self.slot_index = {s: i for i, s in enumerate(config["slots"])}
+        self.full = (1 << len(self.slots)) - 1
+        self.room_capacity = config["room_capacity"]
+        # Smallest room first, so free-room answers are best-fit ordered.
+        self.rooms_by_capacity = sorted(self.room_capacity.items(), key=lambda rc: (rc[1], rc[0]))
+        self._capacities = [capacity for _, capacity in self.rooms_by_capacity]
+        self.sizes = sizes
+        self.masks = {kind: {} for kind in KINDS}
+        self._extra = {}
+        self.lock = threading.Lock()
+
+    def slot_of(self, row):
+        return self.slot_index.get(f"{row.get('day', '')}_{row.get('slot', '')}")
+
+    def _cells(self, row):
+        idx = self.slot_of(row)
+        if idx is None:
+            return idx, []
+        cells = [("room", row.get("room", "")), ("department", row.get("target") or "ALL"), ("slot", "")]
+        if row.get("teacher", ""):
+            cells.append(("teacher", row["teacher"]))
+        return idx, cells
+
+    def busy(self, kind, key, idx):
+        return bool(self.masks[kind].get(key, 0) >> idx & 1)
+
+    def add(self, row):
+        idx, cells = self._cells(row)
+        for kind, key in cells:
+            masks = self.masks[kind]
+            mask = masks.get(key, 0)
+            if mask >> idx & 1:
+                cell = (kind, key, idx)
+                self._extra[cell] = self._extra.get(cell, 0) + 1
+            else:
+                masks[key] = mask | (1 << idx)
+
+    def remove(self, row):
+        idx, cells = self._cells(row)
+        for kind, key in cells:
+            cell = (kind, key, idx)
+            extra = self._extra.get(cell, 0)
+            if extra > 1:
+                self._extra[cell] = extra - 1
+            elif extra == 1:
+                del self._extra[cell]
+            else:
+                masks = self.masks[kind]
+                masks[key] = masks.get(key, 0) & ~(1 << idx)
+
+    def department_busy(self, target, idx):
+        if target == "ALL":
+            return self.busy("slot", "", idx)
+        return self.busy("department", target, idx) or self.busy("department", "ALL", idx)
+
+    def size_of(self, row):
+        return self.sizes.get((row.get("subject", ""), row.get("teacher", ""), row.get("target") or "ALL"))
+
+    def capacity_conflict(self, row):
+        room = row.get("room", "")
+        capacity = self.room_capacity.get(room)
+        if capacity is None:
+            return _conflict("room", f"Room {room} is not in the institute config.")
+        students = self.size_of(row)
+        if students is not None and students > capacity:
+            return _conflict(
+                "capacity", f"{row.get('subject', '')} has {students} students; room {room} seats {capacity}."
+            )
+        return None
+
+    def check(self, row):
+        """Conflicts a new row would create against the rows currently indexed."""
+        idx = self.slot_of(row)
+        if idx is None:
+            return [_conflict("slot", f"{row.get('day', '')} {row.get('slot', '')} is not on the institute slot grid.")]
+
+        where = f"{row['day']} {row['slot']}"
+        conflicts = []
+        teacher = row.get("teacher", "")
+        if teacher and self.busy("teacher", teacher, idx):
+            conflicts.append(_conflict("teacher", f"{teacher} already teaches on {where}."))
+        if self.busy("room", row.get("room", ""), idx):
+            conflicts.append(_conflict("room", f"Room {row['room']} is already booked on {where}."))
+        capacity = self.capacity_conflict(row)
+        if capacity:
+            conflicts.append(capacity)
+        target = row.get("target") or "ALL"
+        if self.department_busy(target, idx):
+            conflicts.append(_conflict("department", f"{target} already has a class on {where}."))
+        return conflicts
+
+    def row_conflicts(self, row):
+        """Conflict kinds of a row that is already indexed (dashboard highlighting)."""
+        idx = self.slot_of(row)
+        if idx is None:
+            return ["slot"]
+        kinds = []
+        teacher = row.get("teacher", "")
+        if teacher and ("teacher", teacher, idx) in self._extra:
+            kinds.append("teacher")
+        if ("room", row.get("room", ""), idx) in self._extra:
+            kinds.append("room")
+        capacity = self.capacity_conflict(row)
+        if capacity and capacity["kind"] not in kinds:
+            kinds.append(capacity["kind"])
+        target = row.get("target") or "ALL"
+        if target == "ALL":
+            clash = ("slot", "", idx) in self._extra
+        else:
+            clash = ("department", target, idx) in self._extra or self.busy("department", "ALL", idx)
+        if clash:
+            kinds.append("department")
+        return kinds
+
+    def move(self, old_row, new_row):
+        """Swap old_row for new_row unless that creates a blocking conflict.
+
+        Returns the conflicts found; the index is left unchanged when any of
+        them is blocking.
+        """
+        self.remove(old_row)
+        conflicts = self.check(new_row)
+        if any(c["blocking"] for c in conflicts):
+            self.add(old_row)
+        else:
+            self.add(new_row)
+        return conflicts
+
+
+    # -----------------------------
+    # Free room / free slot queries
+    # -----------------------------
+    # skip_row: the row being edited; its own cells count as free.
+
+    def _skip(self, row):
+        if row is None:
+            return None
+        idx, cells = self._cells(row)
+        return None if idx is None else (idx, set(cells))
+
+    def _mask(self, kind, key, skip):
+        mask = self.masks[kind].get(key, 0)
+        if skip is not None:
+            idx, cells = skip
+            if (kind, key) in cells and (kind, key, idx) not in self._extra:
+                mask &= ~(1 << idx)
+        return mask
+
+    def _department_mask(self, target, skip):
+        if target == "ALL":
+            return self._mask("slot", "", skip)
+        return self._mask("department", target, skip) | self._mask("department", "ALL", skip)
+
+    def rooms_fitting(self, min_capacity):
+        return self.rooms_by_capacity[bisect_left(self._capacities, min_capacity):]
+
+    def free_rooms(self, day, slot, min_capacity=0, skip_row=None):
+        """Rooms seating at least min_capacity that are free at day/slot, smallest first."""
+        idx = self.slot_index.get(f"{day}_{slot}")
+        if idx is None:
+            return []
+        skip = self._skip(skip_row)
+        return [
+            {"room": room, "capacity": capacity}
+            for room, capacity in self.rooms_fitting(min_capacity)
+            if not self._mask("room", room, skip) >> idx & 1
+        ]
+
+    def free_slots(self, teacher, target, min_capacity=0, skip_row=None):
+        """Slots where the teacher and department are free and some room of
+        min_capacity is open, each with its free rooms (smallest first)."""
+        skip = self._skip(skip_row)
+        rooms = [(room, capacity, self._mask("room", room, skip)) for room, capacity in self.rooms_fitting(min_capacity)]
+        room_free = 0
+        for _, _, mask in rooms:
+            room_free |= ~mask
+        busy = self._department_mask(target or "ALL", skip)
+        if teacher:
+            busy |= self._mask("teacher", teacher, skip)
+        free = room_free & ~busy & self.full
+
+        result = []
+        while free:
+            low = free & -free
+            idx = low.bit_length() - 1
+            free ^= low
+            day, slot = self.slots[idx]
+            result.append({
+                "day": day,
+                "slot": slot,
+                "rooms": [{"room": r, "capacity": c} for r, c, mask in rooms if not mask >> idx & 1]
+            })
+        return result
+
+
+def build_index(config, rows, courses):
+    index = AvailabilityIndex(config, course_sizes(courses))
+    for row in rows:
+        index.add(row)
+    return index
@@ -0,0 +1,173 @@
+import hashlib
+import io
+import os
+import re
+import time
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+
+# 36px sidebar/top-bar avatars and the 94px profile card, at 2x density.
+AVATAR_SIZES = (72, 192)
+AVATAR_DEFAULT_SIZE = 192
+WEBP_QUALITY = 80
+HASH_LEN = 16
+GC_GRACE_S = 3600   # collect_orphans leaves uploads younger than this alone
+
+# profile_pics/<sha256 prefix>-<size>.webp (or -orig.<ext> without Pillow)
+AVATAR_NAME_RE = re.compile(r"^([0-9a-f]{%d})-(\d+|orig)\.(webp|png|jpg|jpeg)$" % HASH_LEN)
+
+
+class AvatarError(Exception):
+    pass
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LEN]
+
+
+def _square_thumbnail(img, size):
+    return ImageOps.fit(img, (size, size), method=Image.LANCZOS)
+
+
+def _write_once(path, data):
+    # Content-addressed: an existing file already has these exact bytes.
+    if os.path.exists(path):
+        return
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def save_avatar(raw, ext, upload_dir):
+    """Store an uploaded avatar; returns its path relative to static/."""
+    os.makedirs(upload_dir, exist_ok=True)
+    digest = content_hash(raw)
+
+    if Image is None:
+        filename = f"{digest}-orig{ext}"
+        _write_once(os.path.join(upload_dir, filename), raw)
+        return f"profile_pics/{filename}"
+
+    try:
+        img = Image.open(io.BytesIO(raw))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+    except Exception:
+        raise AvatarError("Could not read image.")
+
+    for size in AVATAR_SIZES:
+        out = io.BytesIO()
+        _square_thumbnail(img, size).save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+        _write_once(os.path.join(upload_dir, f"{digest}-{size}.webp"), out.getvalue())
+
+    return f"profile_pics/{digest}-{AVATAR_DEFAULT_SIZE}.webp"
+
+
+def avatar_url_path(profile_pic, size):
+    # Pick the closest stored thumbnail; legacy uploads are served as-is.
+    folder, _, filename = (profile_pic or "").rpartition("/")
+    m = AVATAR_NAME_RE.match(filename)
+    if not m or m.group(2) == "orig":
+        return profile_pic
+    best = min(AVATAR_SIZES, key=lambda s: (s < size, abs(s - size)))
+    return f"{folder}/{m.group(1)}-{best}.webp"
+
+
+def is_content_addressed(filename):
+    return AVATAR_NAME_RE.match(os.path.basename(filename)) is not None
+
+
+def _avatar_family(filename):
+    # Names sharing one upload: every <hash>-* file, or a legacy file alone.
+    m = AVATAR_NAME_RE.match(filename)
+    return ("hash", m.group(1)) if m else ("name", filename)
+
+
+def remove_replaced_avatar(upload_dir, old_pic, referenced):
+    """Delete the files of one replaced avatar (all its sizes) unless a user
+    in referenced still points at it. Returns the removed names."""
+    old_name = os.path.basename(old_pic or "")
+    if not old_name:
+        return []
+    family = _avatar_family(old_name)
+    if any(_avatar_family(os.path.basename(path)) == family for path in referenced if path):
+        return []
+
+    if family[0] == "name":
+        names = [old_name]
+    else:
+        try:
+            names = [n for n in os.listdir(upload_dir) if _avatar_family(n) == family]
+        except OSError:
+            return []
+    removed = []
+    for name in names:
+        try:
+            os.remove(os.path.join(upload_dir, name))
+            removed.append(name)
+        except OSError:
+            continue
+    return removed
+
+
+def collect_orphans(upload_dir, referenced, grace_s=GC_GRACE_S):
+    """Offline sweep: delete content-addressed avatars no user points at.
+
+    referenced must be read fresh (users.txt) right before the call; files
+    younger than grace_s are kept since their upload may not be saved yet.
+    Returns the removed names."""
+    if not os.path.isdir(upload_dir):
+        return []
+
+    keep = {_avatar_family(os.path.basename(path)) for path in referenced if path}
+    cutoff = time.time() - grace_s
+    removed = []
+    for name in os.listdir(upload_dir):
+        if not AVATAR_NAME_RE.match(name) or _avatar_family(name) in keep:
+            continue
+        path = os.path.join(upload_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed.append(name)
+        except OSError:
+            continue
+    return removed
+
+
+def referenced_avatars(users_file):
+    # profile_pic column (6th) of every users.txt line, read fresh.
+    referenced = []
+    try:
+        with open(users_file, encoding="utf-8") as f:
+            for line in f:
+                parts = line.strip().split(",")
+                if len(parts) >= 6 and parts[5]:
+                    referenced.append(parts[5])
+    except FileNotFoundError:
+        pass
+    return referenced
+
+
+if __name__ == "__main__":
+    # Offline orphan sweep, e.g. from cron:  python avatars.py --gc
+    import argparse
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Avatar storage maintenance.")
+    parser.add_argument("--gc", action="store_true", help="delete avatars no user references")
+    parser.add_argument("--users", default=os.path.join(base_dir, "users.txt"))
+    parser.add_argument("--upload-dir", default=os.path.join(base_dir, "static", "profile_pics"))
+    parser.add_argument("--grace", type=float, default=GC_GRACE_S, help="keep files younger than this (seconds)")
+    args = parser.parse_args()
+    if not args.gc:
+        parser.error("nothing to do (use --gc)")
+    removed = collect_orphans(args.upload_dir, referenced_avatars(args.users), args.grace)
+    print(f"Removed {len(removed)} orphaned avatar file(s).")
+    for name in removed:
+        print(" ", name)
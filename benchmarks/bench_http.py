@@ -0,0 +1,380 @@
+"""HTTP load test for the Flask routes against seeded data stores.
+
+    python benchmarks/bench_http.py --students 2000 --teachers 200 --rows 3000 \
+        --users 50 --duration 30 --mix student=80,teacher=15,admin=5
+
+The app is copied into a scratch directory and its text stores are seeded
+there, so the repository's own .txt files are never touched. Virtual users
+run in threads and drive either the Flask test client (default) or a real
+local server (--mode server). Per-route throughput and latency percentiles
+are printed and written as JSON (default: benchmarks/results/http-<ts>.json).
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import date, datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic_institute import DAYS, DEPARTMENTS, SLOT_NAMES, generate_institute, write_data_file
+
+PASSWORD = "bench-password"
+ROLE_ROUTES = {
+    "student": ["/student/dashboard", "/student/timetable", "/events"],
+    "teacher": ["/teacher/dashboard", "/events"],
+    "admin": ["/admin/dashboard", "/events"]
+}
+
+
+# -----------------------------
+# Seeding
+# -----------------------------
+
+def copy_app(dest):
+    for name in os.listdir(REPO_DIR):
+        if name.endswith(".py"):
+            shutil.copy2(os.path.join(REPO_DIR, name), dest)
+    shutil.copytree(os.path.join(REPO_DIR, "templates"), os.path.join(dest, "templates"))
+    shutil.copytree(
+        os.path.join(REPO_DIR, "static"),
+        os.path.join(dest, "static"),
+        ignore=shutil.ignore_patterns("profile_pics")
+    )
+
+
+def seed_stores(dest, students, teachers, rows, events, history_runs, seed=0):
+    from werkzeug.security import generate_password_hash
+
+    rng = random.Random(seed)
+    # One hash shared by every seeded account keeps seeding fast; login
+    # still pays the full check_password_hash cost per request.
+    pw_hash = generate_password_hash(PASSWORD)
+    n_courses = max(1, rows // 2)
+    institute = generate_institute(n_courses, seed=seed, courses_per_teacher=max(1, n_courses // max(1, teachers)))
+    teacher_names = sorted({c["teacher"] for c in institute["courses"]})
+
+    accounts = {"admin": [], "teacher": [], "student": []}
+    with open(os.path.join(dest, "users.txt"), "w") as f:
+        f.write(f"admin@example.edu,{pw_hash},admin,Admin,ALL,\n")
+        accounts["admin"].append("admin@example.edu")
+        for i, name in enumerate(teacher_names):
+            email = f"teacher{i + 1:04d}@example.edu"
+            f.write(f"{email},{pw_hash},teacher,{name},{DEPARTMENTS[i % len(DEPARTMENTS)]},\n")
+            accounts["teacher"].append(email)
+        for i in range(students):
+            dept = DEPARTMENTS[i % len(DEPARTMENTS)]
+            email = f"{dept.lower()}{i + 1:05d}@example.edu"
+            f.write(f"{email},{pw_hash},student,Student {i + 1},{dept},\n")
+            accounts["student"].append(email)
+
+    write_data_file(os.path.join(dest, "data.txt"), institute["courses"])
+
+    grid = [(d, s) for d in DAYS for s in SLOT_NAMES]
+    rooms = list(institute["rooms"])
+    timetable_rows = []
+    for i in range(rows):
+        course = institute["courses"][i % len(institute["courses"])]
+        day, slot = grid[i % len(grid)]
+        timetable_rows.append({
+            "day": day,
+            "slot": slot,
+            "subject": course["subject"],
+            "room": rooms[(i // len(grid)) % len(rooms)],
+            "teacher": course["teacher"],
+            "target": course["target"],
+            "label": "Teacher Absent" if rng.random() < 0.02 else ""
+        })
+    with open(os.path.join(dest, "timetable_output.txt"), "w") as f:
+        for r in timetable_rows:
+            base = [r["day"], r["slot"], r["subject"], r["room"], r["teacher"], r["target"]]
+            if r["label"]:
+                base.append(r["label"])
+            f.write(",".join(base) + "\n")
+
+    today = date.today()
+    with open(os.path.join(dest, "events.txt"), "w") as f:
+        for i in range(events):
+            f.write(json.dumps({
+                "id": str(uuid.uuid4()),
+                "title": f"Event {i + 1}",
+                "subject": f"Event {i + 1}",
+                "date": (today + timedelta(days=rng.randint(-60, 120))).isoformat(),
+                "type": rng.choice(["general", "test", "exam", "vacation"]),
+                "important": rng.random() < 0.2,
+                "creator_name": "Admin",
+                "creator_email": "admin@example.edu",
+                "creator_role": "admin"
+            }) + "\n")
+
+    with open(os.path.join(dest, "timetable_history.txt"), "w") as f:
+        for i in range(history_runs):
+            f.write(json.dumps({
+                "id": str(uuid.uuid4()),
+                "semester": f"{today.year - i // 4} Jan-Apr Semester",
+                "generated_at": (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d %H:%M:%S"),
+                "generated_by": "admin@example.edu",
+                "total_rows": len(timetable_rows),
+                "subjects": sorted({r["subject"] for r in timetable_rows}),
+                "rows": timetable_rows
+            }) + "\n")
+
+    stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with open(os.path.join(dest, "approval_history.txt"), "w") as f:
+        for email in accounts["student"][:1000]:
+            f.write(f"{stamp},approved,{email},Student,CSE,student,admin@example.edu\n")
+    with open(os.path.join(dest, "preference_history.txt"), "w") as f:
+        for c in institute["courses"][:1000]:
+            f.write(f"{stamp},approved,{c['subject']},{c['teacher']},{c['target']},admin@example.edu\n")
+    for name in ("users_pending.txt", "preference_requests.txt"):
+        open(os.path.join(dest, name), "w").close()
+
+    return accounts
+
+
+# -----------------------------
+# Virtual Users
+# -----------------------------
+
+class TestClientSession:
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        if method == "POST":
+            resp = self.client.post(path, data=data)
+        else:
+            resp = self.client.get(path, headers={"Accept-Encoding": "gzip"})
+        resp.get_data()
+        return resp.status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class ServerSession:
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            _NoRedirect()
+        )
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        req.add_header("Accept-Encoding", "gzip")
+        try:
+            with self.opener.open(req, timeout=60) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def virtual_user(make_session, role, email, deadline, samples, lock):
+    session = make_session()
+    local = []
+
+    t0 = time.perf_counter()
+    status = session.request("POST", "/login", {"role": role, "email": email, "password": PASSWORD})
+    local.append(("/login", status, time.perf_counter() - t0))
+
+    routes = ROLE_ROUTES[role]
+    i = 0
+    while time.perf_counter() < deadline:
+        path = routes[i % len(routes)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            status = session.request("GET", path)
+        except Exception:
+            status = 0
+        local.append((path, status, time.perf_counter() - t0))
+
+    with lock:
+        samples.extend(local)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def summarize(samples, elapsed):
+    by_route = {}
+    for path, status, latency in samples:
+        by_route.setdefault(path, []).append((status, latency))
+
+    report = {}
+    for path in sorted(by_route):
+        entries = by_route[path]
+        latencies = sorted(l for _, l in entries)
+        ok = sum(1 for s, _ in entries if 200 <= s < 400)
+        report[path] = {
+            "requests": len(entries),
+            "errors": len(entries) - ok,
+            "throughput_rps": round(len(entries) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p90_ms": round(percentile(latencies, 90) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2)
+        }
+    return report
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        role, _, weight = part.partition("=")
+        role = role.strip()
+        if role not in ROLE_ROUTES:
+            raise SystemExit(f"Unknown role in --mix: {role}")
+        mix[role] = float(weight or 1)
+    return mix
+
+
+def assign_roles(n_users, mix, accounts, seed):
+    rng = random.Random(seed)
+    roles = [r for r in mix if accounts.get(r)]
+    weights = [mix[r] for r in roles]
+    plan = []
+    for _ in range(n_users):
+        role = rng.choices(roles, weights=weights)[0]
+        plan.append((role, rng.choice(accounts[role])))
+    return plan
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(base_url + "/login", timeout=2).read()
+            return True
+        except Exception:
+            time.sleep(0.2)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--teachers", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=1000, help="timetable_output.txt rows")
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--history-runs", type=int, default=10)
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per run")
+    parser.add_argument("--mix", default="student=80,teacher=15,admin=5")
+    parser.add_argument("--mode", choices=["client", "server"], default="client")
+    parser.add_argument("--server-cmd", default=None,
+                        help="server command for --mode server, e.g. 'uvicorn asgi:application --port {port}'")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="smarttimetable-bench-")
+    server = None
+    try:
+        copy_app(scratch)
+        accounts = seed_stores(
+            scratch, args.students, args.teachers, args.rows,
+            args.events, args.history_runs, seed=args.seed
+        )
+        plan = assign_roles(args.users, parse_mix(args.mix), accounts, args.seed)
+
+        if args.mode == "server":
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            cmd = (args.server_cmd or f"{sys.executable} app.py").format(port=port)
+            env = dict(os.environ, PORT=str(port))
+            server = subprocess.Popen(
+                cmd, shell=True, cwd=scratch, env=env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            if not wait_for_server(base_url):
+                raise SystemExit("Server did not start")
+
+            def make_session():
+                return ServerSession(base_url)
+        else:
+            sys.path.insert(0, scratch)
+            import app as webapp
+            webapp.app.testing = True
+
+            def make_session():
+                return TestClientSession(webapp.app)
+
+        samples = []
+        lock = threading.Lock()
+        start = time.perf_counter()
+        deadline = start + args.duration
+        threads = [
+            threading.Thread(target=virtual_user, args=(make_session, role, email, deadline, samples, lock))
+            for role, email in plan
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    routes = summarize(samples, elapsed)
+    print(f"{'route':<22}{'reqs':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p90':>9}{'p99':>9}")
+    for path, r in routes.items():
+        print(
+            f"{path:<22}{r['requests']:>8}{r['errors']:>6}{r['throughput_rps']:>9}"
+            f"{r['p50_ms']:>9}{r['p90_ms']:>9}{r['p99_ms']:>9}"
+        )
+
+    report = {
+        "benchmark": "http",
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "config": vars(args),
+        "elapsed_s": round(elapsed, 3),
+        "total_requests": len(samples),
+        "routes": routes
+    }
+    out = args.out or os.path.join(
+        BENCH_DIR, "results", f"http-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
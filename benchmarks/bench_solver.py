@@ -0,0 +1,189 @@
+"""Solver benchmark on synthetic institutes.
+
+    python benchmarks/bench_solver.py --courses 50 500 5000 --time-limit 600
+    python benchmarks/bench_solver.py --courses 500 --engine pulp direct
+    python benchmarks/bench_solver.py --courses 500 --formulation rooms classes
+    python benchmarks/bench_solver.py --courses 500 --cohorts 0 100
+    python benchmarks/bench_solver.py --courses 500 --portfolio 1 4
+
+Each scenario runs in its own process so peak RSS is per scenario. Results
+are written as JSON (default: benchmarks/results/solver-<timestamp>.json).
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from synthetic_institute import generate_enrollments, generate_institute, write_data_file, write_enrollment_file
+
+
+def peak_rss_kb():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if sys.platform == "darwin":
+        own //= 1024
+        children //= 1024
+    return own, children
+
+
+def run_scenario(n_courses, seed, time_limit, engine, formulation, cohorts=0, portfolio=1):
+    import timetable
+
+    result = {
+        "courses": n_courses, "seed": seed, "engine": engine, "formulation": formulation,
+        "cohorts": cohorts, "portfolio": portfolio
+    }
+    institute = generate_institute(n_courses, seed=seed)
+    result["teachers"] = len(institute["teachers"])
+    result["rooms"] = len(institute["rooms"])
+    result["classes"] = institute["total_classes"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "data.txt")
+        output_file = os.path.join(tmp, "timetable_output.txt")
+        enrollment_file = os.path.join(tmp, "enrollments.txt")
+        write_data_file(data_file, institute["courses"])
+        write_enrollment_file(enrollment_file, generate_enrollments(institute["courses"], cohorts, seed=seed))
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            ok, msg, metrics = timetable.run(
+                data_file, output_file, rooms=institute["rooms"], time_limit=time_limit,
+                engine=engine, formulation=formulation, enrollment_file=enrollment_file, portfolio=portfolio
+            )
+
+    phases = metrics["phases"]
+    build_s = sum(
+        secs for name, secs in phases.items()
+        if name in ("variables", "columns", "rows", "objective") or name.startswith("constraints_")
+    )
+    result.update(metrics)
+    result.update({
+        "ok": ok,
+        "message": msg,
+        "parse_s": phases.get("parse", 0.0),
+        "conflict_graph_s": phases.get("conflict_graph", 0.0),
+        "build_s": round(build_s, 4),
+        "write_mps_s": phases.get("write_mps", 0.0),
+        "solve_s": phases.get("solve", 0.0),
+        "extract_write_s": round(phases.get("extract", 0.0) + phases.get("write", 0.0), 4)
+    })
+    own, children = peak_rss_kb()
+    result["peak_rss_kb"] = own
+    result["peak_solver_rss_kb"] = children
+    return result
+
+
+def run_isolated(n_courses, seed, time_limit, engine, formulation, cohorts=0, portfolio=1):
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "--child",
+        "--courses", str(n_courses), "--seed", str(seed), "--engine", engine, "--formulation", formulation,
+        "--cohorts", str(cohorts), "--portfolio", str(portfolio)
+    ]
+    if time_limit:
+        cmd += ["--time-limit", str(time_limit)]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    return {
+        "courses": n_courses,
+        "seed": seed,
+        "engine": engine,
+        "formulation": formulation,
+        "cohorts": cohorts,
+        "portfolio": portfolio,
+        "status": "Crashed",
+        "returncode": proc.returncode,
+        "stderr": proc.stderr[-2000:]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-limit", type=int, default=None, help="CBC time limit (seconds)")
+    parser.add_argument(
+        "--engine", nargs="+", default=["pulp"], choices=["pulp", "direct"],
+        help="model engine(s); pulp is the reference"
+    )
+    parser.add_argument(
+        "--formulation", nargs="+", default=["rooms"], choices=["rooms", "classes"],
+        help="x[c,s,r] (rooms) or capacity classes with room post-pass (classes)"
+    )
+    parser.add_argument(
+        "--cohorts", type=int, nargs="+", default=[0],
+        help="synthetic student cohorts (enrollments.txt) per scenario; 0 = no student clash rows"
+    )
+    parser.add_argument(
+        "--portfolio", type=int, nargs="+", default=[1],
+        help="solver configurations raced per scenario (capped at the CPU count); 1 = single CBC run"
+    )
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = run_scenario(
+                args.courses[0], args.seed, args.time_limit, args.engine[0], args.formulation[0], args.cohorts[0],
+                args.portfolio[0]
+            )
+        print(json.dumps(result))
+        return
+
+    scenarios = []
+    for n in args.courses:
+        for cohorts in args.cohorts:
+            for formulation in args.formulation:
+                # the classes model is always built through PuLP
+                engines = ["pulp"] if formulation == "classes" else args.engine
+                for engine in engines:
+                    for portfolio in args.portfolio:
+                        print(
+                            f"Running {n}-course scenario ({engine}, {formulation}, {cohorts} cohorts, "
+                            f"portfolio {portfolio})...",
+                            flush=True
+                        )
+                        result = run_isolated(n, args.seed, args.time_limit, engine, formulation, cohorts, portfolio)
+                        print(
+                            f"  {result.get('status')}: total {result.get('total_s', '-')}s "
+                            f"(build {result.get('build_s', '-')}s, solve {result.get('solve_s', '-')}s), "
+                            f"objective {result.get('objective', '-')}, "
+                            f"student cliques {result.get('student_cliques', '-')}, "
+                            f"winner {result.get('portfolio_winner', '-')}, "
+                            f"peak RSS {result.get('peak_rss_kb', '-')} KB",
+                            flush=True
+                        )
+                        scenarios.append(result)
+
+    import pulp
+    report = {
+        "benchmark": "solver",
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "pulp": pulp.__version__,
+        "machine": platform.machine(),
+        "time_limit": args.time_limit,
+        "scenarios": scenarios
+    }
+
+    out = args.out or os.path.join(
+        BENCH_DIR, "results", f"solver-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Web worker cold-start benchmark: import time and peak RSS.
+
+    python benchmarks/bench_startup.py --runs 7
+
+Each scenario imports a set of modules in a fresh interpreter (the repository
+is only read):
+  web        import app                      (solver loaded on demand)
+  web+solver import timetable, app           (previous eager import)
+  solver     import timetable                (what a generation worker loads)
+Medians of import time, process wall time and peak RSS are printed and
+written as JSON (default: benchmarks/results/startup-<timestamp>.json).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+SCENARIOS = {
+    "web": ["app"],
+    "web+solver": ["timetable", "app"],
+    "solver": ["timetable"]
+}
+HEAVY_MODULES = ["pulp", "numpy", "flask", "jinja2"]
+
+CHILD_CODE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - t0
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss //= 1024
+print(json.dumps({{
+    "import_s": elapsed,
+    "peak_rss_kb": rss,
+    "modules": len(sys.modules),
+    "loaded": [m for m in {heavy!r} if m in sys.modules]
+}}))
+"""
+
+
+def measure(modules):
+    code = CHILD_CODE.format(modules=modules, heavy=HEAVY_MODULES)
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - t0
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith("{"):
+            result = json.loads(line)
+            result["process_s"] = wall
+            return result
+    raise RuntimeError(f"import of {modules} failed:\n{proc.stderr[-2000:]}")
+
+
+def run_scenario(name, runs):
+    samples = [measure(SCENARIOS[name]) for _ in range(runs)]
+    return {
+        "scenario": name,
+        "modules": SCENARIOS[name],
+        "runs": runs,
+        "import_s": round(statistics.median(s["import_s"] for s in samples), 4),
+        "process_s": round(statistics.median(s["process_s"] for s in samples), 4),
+        "peak_rss_kb": int(statistics.median(s["peak_rss_kb"] for s in samples)),
+        "sys_modules": samples[-1]["modules"],
+        "loaded": samples[-1]["loaded"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scenario", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    # warm the OS page cache / .pyc files so the first scenario isn't penalised
+    measure(["app", "timetable"])
+
+    results = []
+    for name in args.scenario:
+        result = run_scenario(name, args.runs)
+        print(
+            f"{name:<11} import {result['import_s'] * 1000:7.1f} ms  "
+            f"process {result['process_s'] * 1000:7.1f} ms  "
+            f"peak RSS {result['peak_rss_kb']:>7} KB  "
+            f"loaded: {', '.join(result['loaded']) or '-'}",
+            flush=True
+        )
+        results.append(result)
+
+    report = {
+        "benchmark": "startup",
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scenarios": results
+    }
+    out = args.out or os.path.join(
+        BENCH_DIR, "results", f"startup-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Synthetic institute generator for benchmarks and load tests.
+
+Produces courses in the data.txt format plus a room table sized so the
+instance stays feasible for the timetable model, and optionally student
+cohorts in the enrollments.txt format.
+"""
+import math
+import random
+
+DEPARTMENTS = ["CSE", "ECE", "IT", "ME"]
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri"]
+SLOT_NAMES = ["S1", "S2", "S3", "S4"]
+ROOM_CAPACITIES = [40, 50, 60, 80]
+SLOTS_PER_WEEK = len(DAYS) * len(SLOT_NAMES)
+
+
+def generate_institute(
+    n_courses,
+    seed=0,
+    pref_density=0.7,
+    courses_per_teacher=4,
+    room_utilisation=0.6,
+    departments=DEPARTMENTS
+):
+    rng = random.Random(seed)
+    n_teachers = max(1, math.ceil(n_courses / courses_per_teacher))
+    teachers = [
+        {
+            "name": f"Teacher {i + 1:04d}",
+            "email": f"teacher{i + 1:04d}@example.edu",
+            "department": departments[i % len(departments)]
+        }
+        for i in range(n_teachers)
+    ]
+
+    courses = []
+    total_classes = 0
+    for i in range(n_courses):
+        teacher = teachers[i % n_teachers]
+        # Each of the three preference slots is filled with probability
+        # pref_density; the model schedules one class per filled slot.
+        n_prefs = max(1, sum(1 for _ in range(3) if rng.random() < pref_density))
+        picks = rng.sample([(d, s) for d in DAYS for s in SLOT_NAMES], n_prefs)
+        prefs = [f"{d}:{s}" for d, s in picks]
+        total_classes += n_prefs
+        courses.append({
+            "subject": f"Course {i + 1:05d}",
+            "teacher": teacher["name"],
+            "students": str(rng.randint(15, 50)),
+            "target": rng.choice(departments + ["ALL"]),
+            "prefs": (prefs + ["-:-", "-:-", "-:-"])[:3]
+        })
+
+    n_rooms = max(1, math.ceil(total_classes / (SLOTS_PER_WEEK * room_utilisation)))
+    rooms = {
+        f"R{i + 1}": ROOM_CAPACITIES[i % len(ROOM_CAPACITIES)]
+        for i in range(n_rooms)
+    }
+
+    return {
+        "courses": courses,
+        "teachers": teachers,
+        "rooms": rooms,
+        "total_classes": total_classes
+    }
+
+
+def serialize_course(course):
+    return ",".join([
+        course["subject"],
+        course["teacher"],
+        str(course["students"]),
+        course.get("target", "ALL"),
+        course["prefs"][0],
+        course["prefs"][1],
+        course["prefs"][2]
+    ])
+
+
+def write_data_file(path, courses):
+    with open(path, "w") as f:
+        for course in courses:
+            f.write(serialize_course(course) + "\n")
+
+
+def generate_enrollments(courses, n_cohorts, seed=0, courses_per_cohort=4):
+    # Each cohort takes a few courses aimed at its department (or ALL).
+    rng = random.Random(seed)
+    by_target = {}
+    for c in courses:
+        by_target.setdefault(c.get("target", "ALL"), []).append(c["subject"])
+    departments = [d for d in by_target if d != "ALL"] or ["ALL"]
+    cohorts = []
+    for i in range(n_cohorts):
+        dept = departments[i % len(departments)]
+        pool = by_target.get(dept, []) + by_target.get("ALL", [])
+        taken = rng.sample(pool, min(courses_per_cohort, len(pool)))
+        cohorts.append({"name": f"{dept}-Cohort{i + 1:04d}", "size": rng.randint(20, 60), "courses": taken})
+    return cohorts
+
+
+def write_enrollment_file(path, cohorts):
+    with open(path, "w") as f:
+        for cohort in cohorts:
+            f.write(f"{cohort['name']},{cohort['size']},{';'.join(cohort['courses'])}\n")
@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+
+# -----------------------------
+# Generation Service
+# -----------------------------
+# The web tier never imports the solver stack (timetable -> pulp, numpy).
+# GENERATION_MODE=process (default) runs each generation in a fresh
+# `python generation_service.py` process, so workers stay small and the
+# solver's memory is returned to the OS when it finishes; "inline" imports
+# timetable lazily in the web process instead.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATION_MODE = os.environ.get("GENERATION_MODE", "process")
+
+# One generation at a time per web process (they all write timetable_output.txt).
+_generation_lock = threading.Lock()
+
+
+def run_generation(**kwargs):
+    """Same contract as timetable.run(): (ok, message, metrics)."""
+    with _generation_lock:
+        if GENERATION_MODE == "inline":
+            import timetable
+            return timetable.run(**kwargs)
+        return _run_in_subprocess(kwargs)
+
+
+def _run_in_subprocess(kwargs):
+    fd, result_path = tempfile.mkstemp(prefix="generation_", suffix=".json")
+    os.close(fd)
+    try:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), result_path, json.dumps(kwargs)],
+            cwd=BASE_DIR
+        )
+        if proc.returncode != 0:
+            return False, f"ERROR: generation worker failed (exit code {proc.returncode}).", {}
+        with open(result_path) as f:
+            ok, msg, metrics = json.load(f)
+        return ok, msg, metrics
+    except (OSError, ValueError):
+        return False, "ERROR: generation worker returned no result.", {}
+    finally:
+        if os.path.exists(result_path):
+            os.remove(result_path)
+
+
+# Worker entry point: python generation_service.py <result.json> <kwargs json>
+if __name__ == "__main__":
+    import timetable
+    result = timetable.run(**json.loads(sys.argv[2]))
+    with open(sys.argv[1], "w") as f:
+        json.dump(result, f)
@@ -0,0 +1,227 @@
+import json
+import os
+import re
+import threading
+
+
+# -----------------------------
+# Defaults
+# -----------------------------
+# Used until an admin saves institute_config.json (same values the solver
+# had hardcoded before).
+
+DEFAULT_CONFIG = {
+    "days": ["Mon", "Tue", "Wed", "Thu", "Fri"],
+    "slot_names": ["S1", "S2", "S3", "S4"],
+    "late_slots": ["S4"],
+    "rooms": [
+        {"name": "R1", "capacity": 50, "features": []},
+        {"name": "R2", "capacity": 40, "features": []},
+        {"name": "R3", "capacity": 35, "features": []}
+    ],
+    "priorities": {"T1": 5, "T2": 15, "T3": 25},
+    "default_priority": 20
+}
+
+# Day/slot names end up in "Mon_S1" slot ids and "Mon:S1" data.txt entries.
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9]+$")
+ROOM_PATTERN = re.compile(r"^[A-Za-z0-9 ._-]+$")
+
+
+class ConfigError(ValueError):
+    pass
+
+
+# -----------------------------
+# Validation
+# -----------------------------
+
+def _name_list(values, label):
+    names = []
+    for v in values:
+        v = str(v).strip()
+        if not v:
+            continue
+        if not NAME_PATTERN.match(v):
+            raise ConfigError(f"Invalid {label} name: {v} (letters and digits only).")
+        if v in names:
+            raise ConfigError(f"Duplicate {label}: {v}.")
+        names.append(v)
+    if not names:
+        raise ConfigError(f"At least one {label} is required.")
+    return names
+
+
+def normalize_config(raw):
+    days = _name_list(raw.get("days", []), "day")
+    slot_names = _name_list(raw.get("slot_names", []), "slot")
+    late_slots = [s for s in (str(v).strip() for v in raw.get("late_slots", [])) if s]
+    for s in late_slots:
+        if s not in slot_names:
+            raise ConfigError(f"Late slot {s} is not in the slot list.")
+
+    rooms = []
+    seen = set()
+    for room in raw.get("rooms", []):
+        name = str(room.get("name", "")).strip()
+        if not name or not ROOM_PATTERN.match(name):
+            raise ConfigError(f"Invalid room name: {name or '(empty)'}.")
+        if name in seen:
+            raise ConfigError(f"Duplicate room: {name}.")
+        try:
+            capacity = int(room.get("capacity"))
+        except (TypeError, ValueError):
+            raise ConfigError(f"Invalid capacity for room {name}.")
+        if capacity <= 0:
+            raise ConfigError(f"Capacity for room {name} must be positive.")
+        features = sorted({str(f).strip().lower() for f in room.get("features", []) if str(f).strip()})
+        seen.add(name)
+        rooms.append({"name": name, "capacity": capacity, "features": features})
+    if not rooms:
+        raise ConfigError("At least one room is required.")
+
+    priorities = {}
+    for teacher, value in raw.get("priorities", {}).items():
+        teacher = str(teacher).strip()
+        if not teacher:
+            continue
+        try:
+            priorities[teacher] = int(value)
+        except (TypeError, ValueError):
+            raise ConfigError(f"Invalid priority for {teacher}.")
+    try:
+        default_priority = int(raw.get("default_priority", DEFAULT_CONFIG["default_priority"]))
+    except (TypeError, ValueError):
+        raise ConfigError("Invalid default priority.")
+
+    return {
+        "days": days,
+        "slot_names": slot_names,
+        "late_slots": late_slots,
+        "rooms": rooms,
+        "priorities": priorities,
+        "default_priority": default_priority
+    }
+
+
+def with_derived(config):
+    # Model dimensions and lookups the solver and the app read directly.
+    result = dict(config)
+    result["slots"] = [f"{d}_{s}" for d in config["days"] for s in config["slot_names"]]
+    result["room_capacity"] = {r["name"]: r["capacity"] for r in config["rooms"]}
+    result["max_capacity"] = max(r["capacity"] for r in config["rooms"])
+    result["room_tiers"] = capacity_tiers(result["room_capacity"])
+    return result
+
+
+def capacity_tiers(room_capacity):
+    # [(capacity, [rooms...]), ...] largest first; rooms in one tier are
+    # interchangeable for the solver.
+    tiers = {}
+    for name, capacity in room_capacity.items():
+        tiers.setdefault(capacity, []).append(name)
+    return [(capacity, tiers[capacity]) for capacity in sorted(tiers, reverse=True)]
+
+
+# -----------------------------
+# Store
+# -----------------------------
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _version(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def load_config(path):
+    """Return the institute config (with derived fields), re-read only when the file changes."""
+    version = _version(path)
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    config = DEFAULT_CONFIG
+    if version is not None:
+        try:
+            with open(path) as f:
+                config = normalize_config(json.load(f))
+        except (OSError, ValueError):
+            # Unreadable/invalid file: keep serving the last good config.
+            if cached is not None:
+                return cached[1]
+            config = DEFAULT_CONFIG
+
+    result = with_derived(config)
+    with _cache_lock:
+        _cache[path] = (version, result)
+    return result
+
+
+def save_config(path, config):
+    config = normalize_config(config)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(config, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+    return config
+
+
+# -----------------------------
+# Admin Form
+# -----------------------------
+# rooms:      one per line, "name, capacity, feature; feature"
+# priorities: one per line, "teacher, priority"
+
+def _split_list(text):
+    return [part.strip() for part in text.replace("\n", ",").split(",") if part.strip()]
+
+
+def parse_config_form(form):
+    rooms = []
+    for line in form.get("rooms", "").splitlines():
+        if not line.strip():
+            continue
+        parts = [p.strip() for p in line.split(",")]
+        if len(parts) < 2:
+            raise ConfigError(f"Room line needs a name and capacity: {line.strip()}")
+        features = parts[2].split(";") if len(parts) > 2 else []
+        rooms.append({"name": parts[0], "capacity": parts[1], "features": features})
+
+    priorities = {}
+    for line in form.get("priorities", "").splitlines():
+        if not line.strip():
+            continue
+        teacher, _, value = line.rpartition(",")
+        if not teacher.strip():
+            raise ConfigError(f"Priority line needs a teacher and value: {line.strip()}")
+        priorities[teacher.strip()] = value.strip()
+
+    return {
+        "days": _split_list(form.get("days", "")),
+        "slot_names": _split_list(form.get("slot_names", "")),
+        "late_slots": _split_list(form.get("late_slots", "")),
+        "rooms": rooms,
+        "priorities": priorities,
+        "default_priority": form.get("default_priority", "").strip() or DEFAULT_CONFIG["default_priority"]
+    }
+
+
+def config_form_values(config):
+    return {
+        "days": ", ".join(config["days"]),
+        "slot_names": ", ".join(config["slot_names"]),
+        "late_slots": ", ".join(config["late_slots"]),
+        "rooms": "\n".join(
+            f"{r['name']}, {r['capacity']}" + (f", {'; '.join(r['features'])}" if r["features"] else "")
+            for r in config["rooms"]
+        ),
+        "priorities": "\n".join(f"{t}, {p}" for t, p in config["priorities"].items()),
+        "default_priority": config["default_priority"]
+    }
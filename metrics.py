@@ -0,0 +1,149 @@
+import bisect
+import threading
+
+
+# -----------------------------
+# Metric Families
+# -----------------------------
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SOLVER_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+METRIC_HELP = {
+    "smarttimetable_http_requests_total": ("counter", "HTTP responses by route, method and status."),
+    "smarttimetable_http_request_duration_seconds": ("histogram", "Request latency by route."),
+    "smarttimetable_store_ops_total": ("counter", "Text store reads/writes by file."),
+    "smarttimetable_store_bytes_total": ("counter", "Bytes read/written by file."),
+    "smarttimetable_store_duration_seconds": ("histogram", "Text store I/O duration by file."),
+    "smarttimetable_solver_jobs_total": ("counter", "Timetable generation jobs by result."),
+    "smarttimetable_solver_duration_seconds": ("histogram", "Timetable generation wall time."),
+    "smarttimetable_cache_requests_total": ("counter", "Cache lookups by cache and result."),
+    "smarttimetable_notifications_total": ("counter", "Change notifications by stage (enqueued, delivered, failed, parked)."),
+    "smarttimetable_snapshot_files_total": ("counter", "Static timetable snapshot scopes (re)written.")
+}
+
+
+# -----------------------------
+# Per-thread Shards
+# -----------------------------
+# Each thread only ever writes to its own shard, so recording never takes a
+# lock. A scrape sums all shards and folds those of finished threads into a
+# retired shard so short-lived request threads don't pile up.
+
+_local = threading.local()
+_shards = {}
+_retired = {"counters": {}, "histograms": {}}
+_scrape_lock = threading.Lock()
+_collectors = []
+
+
+def _shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = {"counters": {}, "histograms": {}, "thread": threading.current_thread()}
+        _local.shard = shard
+        _shards[id(shard)] = shard
+    return shard
+
+
+def inc(name, labels=(), amount=1):
+    counters = _shard()["counters"]
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + amount
+
+
+def observe(name, labels, value, buckets=LATENCY_BUCKETS):
+    histograms = _shard()["histograms"]
+    key = (name, labels)
+    entry = histograms.get(key)
+    if entry is None:
+        # per-bucket counts (+Inf last), then total count and sum
+        entry = [0] * (len(buckets) + 1) + [0, 0.0, buckets]
+        histograms[key] = entry
+    entry[bisect.bisect_left(buckets, value)] += 1
+    entry[-3] += 1
+    entry[-2] += value
+
+
+def register_collector(fn):
+    # fn() -> iterable of (counter_name, labels, value), read at scrape time.
+    _collectors.append(fn)
+
+
+def _merge(target, shard):
+    for key, value in list(shard["counters"].items()):
+        target["counters"][key] = target["counters"].get(key, 0) + value
+    for key, entry in list(shard["histograms"].items()):
+        current = target["histograms"].get(key)
+        if current is None:
+            target["histograms"][key] = list(entry)
+            continue
+        for i in range(len(entry) - 1):
+            current[i] += entry[i]
+
+
+def snapshot():
+    with _scrape_lock:
+        for key, shard in list(_shards.items()):
+            if not shard["thread"].is_alive():
+                _merge(_retired, shard)
+                _shards.pop(key, None)
+
+        total = {"counters": {}, "histograms": {}}
+        _merge(total, _retired)
+        for shard in list(_shards.values()):
+            _merge(total, shard)
+
+    for fn in _collectors:
+        for name, labels, value in fn():
+            total["counters"][(name, labels)] = value
+    return total
+
+
+# -----------------------------
+# Prometheus Text Format
+# -----------------------------
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def render_prometheus():
+    data = snapshot()
+    by_name = {}
+    for (name, labels), value in data["counters"].items():
+        by_name.setdefault(name, []).append(("counter", labels, value))
+    for (name, labels), entry in data["histograms"].items():
+        by_name.setdefault(name, []).append(("histogram", labels, entry))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text = METRIC_HELP.get(name, (by_name[name][0][0], ""))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for _, labels, value in sorted(by_name[name], key=lambda item: item[1]):
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+                continue
+            buckets = value[-1]
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value[-3]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(value[-2])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value[-3]}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,411 @@
+import json
+import smtplib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from email.message import EmailMessage
+from itertools import chain, islice
+
+import metrics
+
+
+# -----------------------------
+# Change Notifications
+# -----------------------------
+# Timetable changes become per-user notifications in a durable SQLite
+# outbox, delivered in batches by a background thread:
+#
+#   diff -> recipients (teachers by name, students by department) -> outbox
+#   -> claim a batch of users -> one digest per user -> transports
+#
+# Everything pending for a user is coalesced into one digest: a regeneration
+# touching 2000 students is 2000 messages, not one per changed class, and
+# edits made within the coalescing window arrive together. Claims happen
+# inside one SQLite write transaction, so worker processes can share the
+# outbox; a claim older than CLAIM_TIMEOUT_S (crashed sender) is retried,
+# so delivery is at-least-once.
+#
+# Each item records the transports that already delivered it (sent_via), so
+# a failing transport is retried on its own without duplicating the others.
+# Retries back off exponentially; after MAX_ATTEMPTS an item is parked
+# (failed_at) and no longer pending.
+
+MAX_LINES = 20          # change lines per digest
+CLAIM_TIMEOUT_S = 300
+MAX_ATTEMPTS = 8
+RETRY_BASE_S = 10       # 10 s, 20 s, 40 s ... capped at RETRY_MAX_S
+RETRY_MAX_S = 3600
+
+
+def _place(p):
+    return f"{p['day']} {p['slot']} in {p['room']}"
+
+
+def change_lines(diff):
+    # [(teacher, target, line)] for every change in a timetable_diff diff.
+    lines = []
+    for c in diff["moved"]:
+        lines.append((c["teacher"], c["target"], f"{c['subject']} ({c['target']}) moved from {_place(c['from'])} to {_place(c['to'])}"))
+    for c in diff["relabelled"]:
+        label = c["to"]["label"] or f"back to normal (was {c['from']['label']})"
+        lines.append((c["teacher"], c["target"], f"{c['subject']} ({c['target']}) on {c['to']['day']} {c['to']['slot']}: {label}"))
+    for c in diff["added"]:
+        label = f" ({c['label']})" if c["label"] else ""
+        lines.append((c["teacher"], c["target"], f"{c['subject']} ({c['target']}) added: {_place(c)}{label}"))
+    for c in diff["removed"]:
+        lines.append((c["teacher"], c["target"], f"{c['subject']} ({c['target']}) removed: {_place(c)}"))
+    return lines
+
+
+def recipients(diff, users):
+    """{email: {"name", "lines", "more"}} for every teacher and student whose
+    timetable the diff touches. Students see their department's and "ALL"
+    classes (case-insensitively, as on the dashboard); a teacher sees their
+    own."""
+    by_teacher, by_target = {}, {}
+    for teacher, target, line in change_lines(diff):
+        by_teacher.setdefault(teacher, []).append(line)
+        by_target.setdefault((target or "ALL").upper(), []).append(line)
+
+    result = {}
+    for u in users:
+        if u["role"] == "teacher":
+            groups = [by_teacher.get(u["name"], [])]
+        elif u["role"] == "student":
+            department = (u.get("department") or "ALL").upper()
+            if department == "ALL":
+                groups = list(by_target.values())
+            else:
+                groups = [by_target.get(department, []), by_target.get("ALL", [])]
+        else:
+            continue
+        total = sum(len(g) for g in groups)
+        if total:
+            result[u["email"]] = {
+                "name": u["name"],
+                "lines": list(islice(chain.from_iterable(groups), MAX_LINES)),
+                "more": max(0, total - MAX_LINES)
+            }
+    return result
+
+
+# -----------------------------
+# Outbox
+# -----------------------------
+
+class Outbox:
+    """Durable per-user notification queue plus the in-app inbox."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY, email TEXT, name TEXT, payload TEXT, "
+            "created_at REAL, claimed_at REAL, delivered_at REAL, attempts INTEGER DEFAULT 0, "
+            "sent_via TEXT DEFAULT '', retry_at REAL DEFAULT 0, failed_at REAL)"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(outbox)")}
+        for column, decl in (("sent_via", "TEXT DEFAULT ''"), ("retry_at", "REAL DEFAULT 0"), ("failed_at", "REAL")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE outbox ADD COLUMN {column} {decl}")
+        conn.execute("CREATE INDEX IF NOT EXISTS outbox_pending ON outbox(delivered_at, email)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS inbox ("
+            "id INTEGER PRIMARY KEY, email TEXT, title TEXT, lines TEXT, created_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS inbox_email ON inbox(email, id)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        # Autocommit connection: one explicit write transaction per call.
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+
+    def enqueue(self, event, targets):
+        # targets: recipients() output. One transaction for the whole fan-out.
+        now = time.time()
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT INTO outbox (email, name, payload, created_at) VALUES (?, ?, ?, ?)",
+                [
+                    (email, t["name"], json.dumps({"event": event, "lines": t["lines"], "more": t["more"]}), now)
+                    for email, t in targets.items()
+                ]
+            )
+        return len(targets)
+
+    def claim(self, max_users, settle_s=0.0):
+        """Claim everything due for up to max_users users whose oldest
+        pending item is at least settle_s old.
+
+        Returns the claimed items as {"id", "email", "name", "payload",
+        "sent_via", "attempts"} in id order; build_digests() groups them."""
+        now = time.time()
+        with self._write() as conn:
+            pending = (
+                "delivered_at IS NULL AND failed_at IS NULL AND retry_at <= ? "
+                "AND (claimed_at IS NULL OR claimed_at < ?)"
+            )
+            params = (now, now - CLAIM_TIMEOUT_S)
+            emails = [row[0] for row in conn.execute(
+                f"SELECT email FROM outbox WHERE {pending} GROUP BY email "
+                "HAVING MIN(created_at) <= ? ORDER BY MIN(id) LIMIT ?",
+                (*params, now - settle_s, max_users)
+            )]
+            if not emails:
+                return []
+            marks = ",".join("?" * len(emails))
+            rows = conn.execute(
+                f"SELECT id, email, name, payload, sent_via, attempts FROM outbox "
+                f"WHERE {pending} AND email IN ({marks}) ORDER BY id",
+                (*params, *emails)
+            ).fetchall()
+            conn.execute(
+                f"UPDATE outbox SET claimed_at = ? WHERE {pending} AND email IN ({marks})",
+                (now, *params, *emails)
+            )
+        return [
+            {
+                "id": row_id, "email": email, "name": name, "payload": json.loads(payload),
+                "sent_via": set(filter(None, sent_via.split(","))), "attempts": attempts
+            }
+            for row_id, email, name, payload, sent_via, attempts in rows
+        ]
+
+    def _mark(self, sql, params, ids):
+        with self._write() as conn:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                conn.execute(sql.format(marks=",".join("?" * len(chunk))), (*params, *chunk))
+
+    def mark_sent(self, transport, ids):
+        self._mark(
+            "UPDATE outbox SET sent_via = sent_via || ? || ',' WHERE id IN ({marks})",
+            (transport,), ids
+        )
+
+    def complete(self, ids):
+        self._mark("UPDATE outbox SET delivered_at = ? WHERE id IN ({marks})", (time.time(),), ids)
+
+    def release(self, items):
+        """Back off the given claimed items; park the ones out of attempts.
+        Returns the number parked."""
+        now = time.time()
+        retry, parked = {}, []
+        for item in items:
+            attempts = item["attempts"] + 1
+            if attempts >= MAX_ATTEMPTS:
+                parked.append(item["id"])
+            else:
+                retry.setdefault(min(RETRY_BASE_S * 2 ** (attempts - 1), RETRY_MAX_S), []).append(item["id"])
+        for delay, ids in retry.items():
+            self._mark(
+                "UPDATE outbox SET claimed_at = NULL, attempts = attempts + 1, retry_at = ? WHERE id IN ({marks})",
+                (now + delay,), ids
+            )
+        if parked:
+            self._mark(
+                "UPDATE outbox SET claimed_at = NULL, attempts = attempts + 1, failed_at = ? WHERE id IN ({marks})",
+                (now,), parked
+            )
+        return len(parked)
+
+    def pending_count(self):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM outbox WHERE delivered_at IS NULL AND failed_at IS NULL"
+        ).fetchone()[0]
+
+    def add_inbox(self, digests):
+        now = time.time()
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT INTO inbox (email, title, lines, created_at) VALUES (?, ?, ?, ?)",
+                [(d["email"], d["title"], json.dumps(digest_lines(d)), now) for d in digests]
+            )
+
+    def latest_inbox_id(self, email):
+        row = self._conn().execute("SELECT MAX(id) FROM inbox WHERE email = ?", (email,)).fetchone()
+        return row[0] or 0
+
+    def inbox(self, email, after_id=0, limit=20):
+        rows = self._conn().execute(
+            "SELECT id, title, lines, created_at FROM inbox WHERE email = ? AND id > ? ORDER BY id DESC LIMIT ?",
+            (email, after_id, limit)
+        ).fetchall()
+        return [
+            {"id": row_id, "title": title, "lines": json.loads(lines), "created_at": created_at}
+            for row_id, title, lines, created_at in reversed(rows)
+        ]
+
+
+def build_digests(items):
+    # One digest per user from claimed items (id order): {"email", "name",
+    # "events", "lines", "more", "ids", "title"}.
+    digests = {}
+    for item in items:
+        d = digests.setdefault(item["email"], {
+            "email": item["email"], "name": item["name"], "events": [], "lines": [], "more": 0, "ids": []
+        })
+        payload = item["payload"]
+        d["ids"].append(item["id"])
+        d["events"].append(payload["event"])
+        room = MAX_LINES - len(d["lines"])
+        d["lines"].extend(payload["lines"][:room])
+        d["more"] += payload["more"] + max(0, len(payload["lines"]) - room)
+    for d in digests.values():
+        d["title"] = d["events"][0] if len(d["events"]) == 1 else f"{len(d['events'])} timetable updates"
+    return list(digests.values())
+
+
+def digest_lines(digest):
+    lines = list(digest["lines"])
+    if digest["more"]:
+        lines.append(f"... and {digest['more']} more change(s)")
+    return lines
+
+
+# -----------------------------
+# Transports
+# -----------------------------
+# send(digests) delivers one batch; raising leaves the batch in the outbox
+# for a retry.
+
+class InAppTransport:
+    """Stores digests in the inbox table, streamed to dashboards over SSE."""
+
+    name = "inapp"
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+
+    def send(self, digests):
+        self.outbox.add_inbox(digests)
+
+
+class SMTPTransport:
+    """One SMTP session per batch, one message per user."""
+
+    name = "smtp"
+
+    def __init__(self, host, port, sender):
+        self.host = host
+        self.port = port
+        self.sender = sender
+
+    def send(self, digests):
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            for d in digests:
+                msg = EmailMessage()
+                msg["From"] = self.sender
+                msg["To"] = d["email"]
+                msg["Subject"] = f"Timetable: {d['title']}"
+                body = "\n".join(f"- {line}" for line in digest_lines(d))
+                msg.set_content(f"Hi {d['name']},\n\nYour timetable changed:\n\n{body}\n")
+                smtp.send_message(msg)
+
+
+def create_transports(names, outbox, smtp_host="localhost", smtp_port=25, smtp_sender="timetable@localhost"):
+    transports = []
+    for name in names:
+        if name == "inapp":
+            transports.append(InAppTransport(outbox))
+        elif name == "smtp":
+            transports.append(SMTPTransport(smtp_host, smtp_port, smtp_sender))
+    return transports
+
+
+# -----------------------------
+# Dispatcher
+# -----------------------------
+
+class Dispatcher:
+    """Per-process delivery loop; started on the first enqueue."""
+
+    def __init__(self, outbox, transports, batch_users=200, settle_s=2.0, interval_s=2.0):
+        self.outbox = outbox
+        self.transports = transports
+        self.batch_users = batch_users
+        self.settle_s = settle_s
+        self.interval_s = interval_s
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def wake(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._loop, name="notification-dispatcher", daemon=True)
+                    self._thread.start()
+        self._wake.set()
+
+    def start(self):
+        # Resume delivery of items left pending by a previous run.
+        if self.outbox.pending_count():
+            self.wake()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Keep the thread alive; claimed items are retried after
+                # CLAIM_TIMEOUT_S.
+                print("Notification delivery failed:", repr(e))
+
+    def flush(self, settle_s=None):
+        """Deliver every settled batch through each transport that has not
+        delivered it yet; returns the number of users fully delivered."""
+        sent = 0
+        while True:
+            items = self.outbox.claim(self.batch_users, self.settle_s if settle_s is None else settle_s)
+            if not items:
+                return sent
+            for transport in self.transports:
+                todo = [item for item in items if transport.name not in item["sent_via"]]
+                if not todo:
+                    continue
+                batch = build_digests(todo)
+                try:
+                    transport.send(batch)
+                except Exception as e:
+                    # Any transport error (not just network/SMTP) is retried
+                    # with backoff, then parked.
+                    print(f"Notification delivery failed ({transport.name}):", repr(e))
+                    metrics.inc("smarttimetable_notifications_total", (("stage", "failed"),), len(batch))
+                    continue
+                self.outbox.mark_sent(transport.name, [item["id"] for item in todo])
+                for item in todo:
+                    item["sent_via"].add(transport.name)
+
+            names = {transport.name for transport in self.transports}
+            done = [item for item in items if names <= item["sent_via"]]
+            retry = [item for item in items if not names <= item["sent_via"]]
+            if done:
+                self.outbox.complete([item["id"] for item in done])
+            parked = self.outbox.release(retry) if retry else 0
+            if parked:
+                metrics.inc("smarttimetable_notifications_total", (("stage", "parked"),), parked)
+            delivered = {item["email"] for item in done} - {item["email"] for item in retry}
+            metrics.inc("smarttimetable_notifications_total", (("stage", "delivered"),), len(delivered))
+            sent += len(delivered)
+            if retry:
+                # A transport is down; the loop retries after the backoff.
+                return sent
@@ -0,0 +1,235 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+# -----------------------------
+# Stack Sampler
+# -----------------------------
+# One daemon thread samples the stacks of the request threads that are being
+# watched via sys._current_frames(). Requests that turn out fast simply drop
+# their samples; forced (admin-header) requests are sampled at a finer rate.
+
+AUTO_INTERVAL = 0.02
+FORCED_INTERVAL = 0.002
+
+
+class ProfileSession:
+
+    def __init__(self, forced):
+        self.forced = forced
+        self.samples = {}
+        self.sample_count = 0
+        self.started = time.perf_counter()
+
+
+_active = {}
+_wake = threading.Event()
+_sampler_lock = threading.Lock()
+_sampler_thread = None
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_label(frame))
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+
+def _sample_loop():
+    while True:
+        sessions = list(_active.items())
+        if not sessions:
+            _wake.clear()
+            if not _active:
+                _wake.wait()
+            continue
+        frames = sys._current_frames()
+        for thread_id, session in sessions:
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            stack = collapse_stack(frame)
+            session.samples[stack] = session.samples.get(stack, 0) + 1
+            session.sample_count += 1
+        forced = any(s.forced for _, s in sessions)
+        time.sleep(FORCED_INTERVAL if forced else AUTO_INTERVAL)
+
+
+def _ensure_sampler():
+    global _sampler_thread
+    if _sampler_thread is not None:
+        return
+    with _sampler_lock:
+        if _sampler_thread is None:
+            _sampler_thread = threading.Thread(target=_sample_loop, name="request-profiler", daemon=True)
+            _sampler_thread.start()
+
+
+def start(forced=False):
+    _ensure_sampler()
+    session = ProfileSession(forced)
+    _active[threading.get_ident()] = session
+    _wake.set()
+    return session
+
+
+def stop():
+    return _active.pop(threading.get_ident(), None)
+
+
+# -----------------------------
+# Profile Files
+# -----------------------------
+
+def _safe_route(route):
+    return re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+
+
+# -----------------------------
+# Profile Storage
+# -----------------------------
+# profiles/<time>_<route>_<ms>.collapsed plus index.jsonl. Every PRUNE_EVERY
+# saves (and on the first save of a process) the oldest profiles beyond
+# max_files or max_age_s are deleted and the index rewritten. Unindexed
+# files younger than PRUNE_GRACE_S are left alone: another worker may be
+# about to index them.
+
+PRUNE_EVERY = 20
+PRUNE_GRACE_S = 60
+_prune_lock = threading.Lock()
+_saves_since_prune = [PRUNE_EVERY]
+
+
+def save_profile(profile_dir, session, route, method, duration_ms, status, reason, max_files=500, max_age_s=7 * 86400):
+    """Write a collapsed-stack file (flamegraph.pl / speedscope), index it
+    and, now and then, prune old profiles."""
+    os.makedirs(profile_dir, exist_ok=True)
+    now = datetime.now()
+    filename = f"{now.strftime('%Y%m%d-%H%M%S-%f')}_{_safe_route(route)}_{int(duration_ms)}ms.collapsed"
+    samples = dict(session.samples)
+    with open(os.path.join(profile_dir, filename), "w") as f:
+        for stack, count in sorted(samples.items(), key=lambda item: -item[1]):
+            f.write(f"{stack} {count}\n")
+
+    record = {
+        "file": filename,
+        "route": route,
+        "method": method,
+        "status": status,
+        "duration_ms": round(duration_ms, 1),
+        "samples": session.sample_count,
+        "reason": reason,
+        "recorded_at": now.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    with _prune_lock:
+        with open(os.path.join(profile_dir, "index.jsonl"), "a") as f:
+            f.write(json.dumps(record) + "\n")
+        _saves_since_prune[0] += 1
+        due = _saves_since_prune[0] >= PRUNE_EVERY
+        if due:
+            _saves_since_prune[0] = 0
+    if due:
+        prune_profiles(profile_dir, max_files, max_age_s)
+    return record
+
+
+def prune_profiles(profile_dir, max_files, max_age_s):
+    """Keep the newest max_files profiles younger than max_age_s; returns the
+    number of files removed."""
+    index_path = os.path.join(profile_dir, "index.jsonl")
+    now = time.time()
+    with _prune_lock:
+        lines = []
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    path = os.path.join(profile_dir, record.get("file", ""))
+                    try:
+                        if now - os.path.getmtime(path) <= max_age_s:
+                            lines.append((record["file"], line if line.endswith("\n") else line + "\n"))
+                    except OSError:
+                        continue
+        kept = lines[-max_files:] if max_files > 0 else []
+
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(line for _, line in kept)
+        os.replace(tmp_path, index_path)
+
+        keep = {name for name, _ in kept}
+        indexed = {name for name, _ in lines}
+        removed = 0
+        for name in os.listdir(profile_dir):
+            if not name.endswith(".collapsed") or name in keep:
+                continue
+            path = os.path.join(profile_dir, name)
+            try:
+                if name in indexed or now - os.path.getmtime(path) > PRUNE_GRACE_S:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+def load_profile_index(profile_dir, limit=50):
+    path = os.path.join(profile_dir, "index.jsonl")
+    records = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if os.path.exists(os.path.join(profile_dir, record.get("file", ""))):
+                    records.append(record)
+    records.reverse()
+    return records[:limit]
+
+
+def summarize_profile(profile_dir, filename, project_files, limit=15):
+    # Inclusive samples per project function (which helper is eating time)
+    # and self samples per leaf frame.
+    inclusive = {}
+    leaf_totals = {}
+    total = 0
+    with open(os.path.join(profile_dir, filename)) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if not stack:
+                continue
+            count = int(count)
+            total += count
+            frames = stack.split(";")
+            leaf_totals[frames[-1]] = leaf_totals.get(frames[-1], 0) + count
+            seen = set()
+            for label in frames:
+                m = re.search(r"\(([^:()]+):\d+\)$", label)
+                if m and m.group(1) in project_files and label not in seen:
+                    seen.add(label)
+                    inclusive[label] = inclusive.get(label, 0) + count
+
+    def top(totals):
+        return sorted(totals.items(), key=lambda item: -item[1])[:limit]
+
+    return {"total": total, "inclusive": top(inclusive), "self": top(leaf_totals)}
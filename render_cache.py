@@ -0,0 +1,92 @@
+import os
+import threading
+from collections import OrderedDict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+# -----------------------------
+# Store Versions
+# -----------------------------
+
+def file_version(path):
+    # mtime + size changes on every save_* rewrite and append_line_safe, and
+    # is shared by every worker process reading the same file.
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "0"
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def store_version(*paths):
+    return "|".join(file_version(p) for p in paths)
+
+
+# -----------------------------
+# Rendered Fragment Cache
+# -----------------------------
+
+class FragmentCache:
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+fragment_cache = FragmentCache()
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache "name", version_key %} ... {% endcache %}
+
+    The block body is rendered once per (name, version_key) and the HTML is
+    reused until the version key changes.
+    """
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(""))
+        body = parser.parse_statements(["name:endcache"], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render_cached", args), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, name, version, caller):
+        key = f"{name}@{version}"
+        html = fragment_cache.get(key)
+        if html is None:
+            html = caller()
+            fragment_cache.set(key, html)
+        return html
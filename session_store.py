@@ -0,0 +1,211 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+# -----------------------------
+# Session Object
+# -----------------------------
+
+class ServerSession(CallbackDict, SessionMixin):
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.old_sid = None
+
+    def rotate(self):
+        # New opaque id (e.g. after login) so a pre-login id can't be reused.
+        if not self.new and self.sid:
+            self.old_sid = self.sid
+        self.sid = new_session_id()
+        self.modified = True
+
+
+def new_session_id():
+    return secrets.token_urlsafe(32)
+
+
+# -----------------------------
+# Backends
+# -----------------------------
+
+class MemorySessionBackend:
+    """Per-process LRU with TTL. Fine for a single worker."""
+
+    def __init__(self, ttl_seconds, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._items = OrderedDict()   # sid -> (expires_at, email, data)
+        self._by_email = {}
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._items.get(sid)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._drop(sid)
+                return None
+            self._items.move_to_end(sid)
+            return dict(entry[2])
+
+    def set(self, sid, data):
+        email = data.get("email", "")
+        with self._lock:
+            if sid in self._items:
+                self._drop(sid)
+            self._items[sid] = (time.time() + self.ttl_seconds, email, dict(data))
+            if email:
+                self._by_email.setdefault(email, set()).add(sid)
+            while len(self._items) > self.max_entries:
+                self._drop(next(iter(self._items)))
+
+    def delete(self, sid):
+        with self._lock:
+            self._drop(sid)
+
+    def invalidate_user(self, email, keep_sid=None):
+        with self._lock:
+            for sid in list(self._by_email.get(email, ())):
+                if sid != keep_sid:
+                    self._drop(sid)
+
+    def _drop(self, sid):
+        entry = self._items.pop(sid, None)
+        if entry is None:
+            return
+        sids = self._by_email.get(entry[1])
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self._by_email[entry[1]]
+
+
+class SQLiteSessionBackend:
+    """Shared by every worker process on the host."""
+
+    def __init__(self, path, ttl_seconds):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "sid TEXT PRIMARY KEY, email TEXT, data TEXT, expires_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_email ON sessions(email)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid):
+        row = self._conn().execute(
+            "SELECT data, expires_at FROM sessions WHERE sid = ?", (sid,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < time.time():
+            self.delete(sid)
+            return None
+        try:
+            return json.loads(row[0])
+        except json.JSONDecodeError:
+            return None
+
+    def set(self, sid, data):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (sid, email, data, expires_at) VALUES (?, ?, ?, ?)",
+            (sid, data.get("email", ""), json.dumps(data), now + self.ttl_seconds)
+        )
+        conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+        conn.commit()
+
+    def delete(self, sid):
+        conn = self._conn()
+        conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+        conn.commit()
+
+    def invalidate_user(self, email, keep_sid=None):
+        conn = self._conn()
+        conn.execute(
+            "DELETE FROM sessions WHERE email = ? AND sid != ?",
+            (email, keep_sid or "")
+        )
+        conn.commit()
+
+
+# -----------------------------
+# Flask Session Interface
+# -----------------------------
+
+class ServerSideSessionInterface(SessionInterface):
+    """Cookie carries only an opaque session id; data lives in the backend."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.backend.get(sid)
+            if data is not None:
+                return ServerSession(data, sid=sid)
+        return ServerSession(sid=new_session_id(), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.old_sid:
+            self.backend.delete(session.old_sid)
+
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified:
+            self.backend.set(session.sid, dict(session))
+
+        if session.new or session.old_sid:
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+
+
+def create_session_backend(kind, db_path, ttl_seconds):
+    if kind == "sqlite":
+        return SQLiteSessionBackend(db_path, ttl_seconds)
+    return MemorySessionBackend(ttl_seconds)
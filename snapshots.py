@@ -0,0 +1,170 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# -----------------------------
+# Static Timetable Snapshots
+# -----------------------------
+# The live timetable is published as static files a front proxy can serve
+# without touching Python: one JSON + one HTML page per department, per
+# teacher and for the whole institute, each with gzip (and brotli, when
+# installed) siblings for gzip_static/brotli_static.
+#
+#   static/snapshots/department-cse-<hash>.json(.gz|.br)
+#   static/snapshots/department-cse-<hash>.html(.gz|.br)
+#   static/snapshots/manifest.json      scope -> current file names
+#
+# Names carry the hash of their JSON body, so they are cached forever and a
+# republish only writes the scopes whose classes actually changed. Files a
+# manifest no longer references are removed after GRACE_S, so pages opened
+# just before a change can still fetch them.
+
+HASH_LEN = 16
+GRACE_S = 600
+MANIFEST_FILE = "manifest.json"
+SNAPSHOT_NAME_RE = re.compile(r"^(institute|department|teacher)(-[a-z0-9-]+)?-([0-9a-f]{%d})\.(json|html)(\.gz|\.br)?$" % HASH_LEN)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LEN]
+
+
+def slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "x"
+
+
+def is_snapshot_file(filename):
+    return SNAPSHOT_NAME_RE.match(os.path.basename(filename)) is not None
+
+
+def snapshot_scopes(rows, departments=()):
+    """{(scope, name): rows} for the institute, every department (its own
+    classes plus "ALL" ones) and every teacher. rows keep their order."""
+    scopes = {("institute", ""): list(rows)}
+    targets = {(row.get("target") or "ALL").upper() for row in rows}
+    for department in (targets | {d.upper() for d in departments if d}) - {"ALL"}:
+        scopes[("department", department)] = [
+            row for row in rows if (row.get("target") or "ALL").upper() in (department, "ALL")
+        ]
+    for row in rows:
+        if row.get("teacher"):
+            scopes.setdefault(("teacher", row["teacher"]), []).append(row)
+    return scopes
+
+
+def _write_once(path, data):
+    # Content-addressed: an existing file already has these exact bytes.
+    if os.path.exists(path):
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_variants(directory, filename, data):
+    # Compressed siblings first: once the plain file exists the set is complete.
+    _write_once(os.path.join(directory, filename + ".gz"), gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_once(os.path.join(directory, filename + ".br"), brotli.compress(data, quality=11))
+    _write_once(os.path.join(directory, filename), data)
+
+
+def load_snapshot_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def publish_snapshots(directory, rows, render_html, departments=(), source=""):
+    """Write the snapshots for rows and swap in a new manifest.
+
+    render_html(scope, name, rows) returns the HTML page for one scope.
+    Returns (manifest, number of scopes written).
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = {"source": source, "institute": None, "departments": {}, "teachers": {}}
+    written = 0
+    for (scope, name), scope_rows in snapshot_scopes(rows, departments).items():
+        body = json.dumps(
+            {"scope": scope, "name": name, "rows": scope_rows},
+            sort_keys=True, separators=(",", ":")
+        ).encode("utf-8")
+        base = f"{scope}-{slug(name)}" if name else scope
+        base = f"{base}-{content_hash(body)}"
+        entry = {"json": base + ".json", "html": base + ".html", "classes": len(scope_rows)}
+        if not os.path.exists(os.path.join(directory, entry["html"])):
+            _write_variants(directory, entry["json"], body)
+            _write_variants(directory, entry["html"], render_html(scope, name, scope_rows).encode("utf-8"))
+            written += 1
+        if scope == "institute":
+            manifest["institute"] = entry
+        else:
+            manifest[scope + "s"][name] = entry
+
+    now = time.time()
+    manifest["retired"] = _retired(load_snapshot_manifest(directory), manifest, now)
+    _write_manifest(directory, manifest)
+    remove_stale(directory, manifest, now)
+    return manifest, written
+
+
+def manifest_files(manifest):
+    files = set()
+    if manifest:
+        for entry in [manifest["institute"], *manifest["departments"].values(), *manifest["teachers"].values()]:
+            if entry:
+                files.update((entry["json"], entry["html"]))
+    return files
+
+
+def _retired(previous, manifest, now):
+    # {file name: time it left the manifest}, for the grace period.
+    current = manifest_files(manifest)
+    retired = dict((previous or {}).get("retired", {}))
+    for filename in manifest_files(previous) - current:
+        retired.setdefault(filename, now)
+    return {
+        filename: since for filename, since in retired.items()
+        if filename not in current and since > now - GRACE_S
+    }
+
+
+def _write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, sort_keys=True, indent=1)
+    os.replace(tmp_path, path)
+
+
+def remove_stale(directory, manifest, now):
+    # Keeps referenced and recently retired files; anything else (retired
+    # past the grace period, or left over from a crashed publish) goes once
+    # it is older than GRACE_S.
+    keep = manifest_files(manifest) | set(manifest["retired"])
+    removed = 0
+    for filename in os.listdir(directory):
+        m = SNAPSHOT_NAME_RE.match(filename)
+        if not m:
+            continue
+        plain = filename[:-len(m.group(5))] if m.group(5) else filename
+        path = os.path.join(directory, filename)
+        try:
+            if plain not in keep and os.path.getmtime(path) < now - GRACE_S:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,153 @@
+import heapq
+
+
+# -----------------------------
+# Substitute Teachers
+# -----------------------------
+# Absent rows are matched to free teachers by min-cost flow:
+#
+#   source -> absent row -> (teacher, slot) -> teacher -> sink
+#
+# (teacher, slot) has capacity 1, so nobody covers two classes at once, and
+# each teacher reaches the sink through parallel arcs whose cost grows with
+# every class they already teach or cover in this batch, which spreads the
+# extra load. Successive shortest paths give the most substitutions at the
+# lowest total cost; instances are tiny (rows x candidates), so a plain
+# Dijkstra with potentials answers in milliseconds.
+
+SUBJECT_COST = 0       # candidate already teaches this subject
+DEPARTMENT_COST = 20   # candidate teaches the row's department
+LOAD_COST = 5          # per class on the candidate's week (existing + this batch)
+ABSENT_LABEL = "Teacher Absent"
+SUBSTITUTE_PREFIX = "Substitute for "
+
+
+def teacher_pools(courses, users):
+    # subject -> teachers and department -> teachers, from data.txt courses
+    # plus the department on each teacher's account.
+    by_subject = {}
+    by_department = {}
+    for c in courses:
+        teacher = c.get("teacher", "")
+        if not teacher:
+            continue
+        by_subject.setdefault(c.get("subject", ""), set()).add(teacher)
+        by_department.setdefault(c.get("target", "ALL") or "ALL", set()).add(teacher)
+    for u in users:
+        if u.get("role") == "teacher":
+            by_department.setdefault(u.get("department", "ALL") or "ALL", set()).add(u["name"])
+    return by_subject, by_department
+
+
+def _min_cost_flow(node_count, arcs, source, sink):
+    # arcs: [(u, v, cost)] all with capacity 1. Returns the set of arc
+    # indexes carrying flow.
+    graph = [[] for _ in range(node_count)]
+    to, cap, cost = [], [], []
+    for u, v, c in arcs:
+        graph[u].append(len(to))
+        to.append(v); cap.append(1); cost.append(c)
+        graph[v].append(len(to))
+        to.append(u); cap.append(0); cost.append(-c)
+
+    potential = [0] * node_count
+    while True:
+        dist = [None] * node_count
+        via = [-1] * node_count
+        dist[source] = 0
+        heap = [(0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for e in graph[u]:
+                if not cap[e]:
+                    continue
+                v = to[e]
+                nd = d + cost[e] + potential[u] - potential[v]
+                if dist[v] is None or nd < dist[v]:
+                    dist[v] = nd
+                    via[v] = e
+                    heapq.heappush(heap, (nd, v))
+        if dist[sink] is None:
+            break
+        for v in range(node_count):
+            if dist[v] is not None:
+                potential[v] += dist[v]
+        v = sink
+        while v != source:
+            e = via[v]
+            cap[e] -= 1
+            cap[e ^ 1] += 1
+            v = to[e ^ 1]
+    return {e // 2 for e in range(0, len(to), 2) if cap[e] == 0}
+
+
+def propose_substitutes(index, rows, absent, courses, users):
+    """Pick a substitute for each absent row (or None when nobody fits).
+
+    index: AvailabilityIndex over `rows`; absent: the rows to cover.
+    Returns [{"row", "substitute", "reason"}] in the order of `absent`.
+    """
+    by_subject, by_department = teacher_pools(courses, users)
+
+    # Nobody absent on a day covers classes that day.
+    absent_on = {}
+    for r in rows:
+        if r.get("label", "") == ABSENT_LABEL:
+            absent_on.setdefault(r["day"], set()).add(r.get("teacher", ""))
+    for r in absent:
+        absent_on.setdefault(r["day"], set()).add(r.get("teacher", ""))
+
+    nodes = {}
+
+    def node(key):
+        if key not in nodes:
+            nodes[key] = len(nodes)
+        return nodes[key]
+
+    source, sink = node("source"), node("sink")
+    arcs = []
+    choices = {}     # arc index -> (row position, teacher, reason)
+    covers = {}      # teacher -> number of distinct slots they could take
+    for pos, r in enumerate(absent):
+        idx = index.slot_of(r)
+        if idx is None:
+            continue
+        candidates = {}
+        for t in by_department.get(r.get("target") or "ALL", ()):
+            candidates[t] = (DEPARTMENT_COST, f"teaches {r.get('target') or 'ALL'}")
+        for t in by_subject.get(r.get("subject", ""), ()):
+            candidates[t] = (SUBJECT_COST, f"teaches {r['subject']}")
+        row_node = node(("row", pos))
+        arcs.append((source, row_node, 0))
+        for t, (cost, reason) in sorted(candidates.items()):
+            if t in absent_on.get(r["day"], ()) or index.busy("teacher", t, idx):
+                continue
+            slot_node = ("slot", t, idx)
+            if slot_node not in nodes:
+                arcs.append((node(slot_node), node(("teacher", t)), 0))
+                covers[t] = covers.get(t, 0) + 1
+            choices[len(arcs)] = (pos, t, reason)
+            arcs.append((row_node, nodes[slot_node], cost))
+
+    for t, count in covers.items():
+        load = bin(index.masks["teacher"].get(t, 0)).count("1")
+        for k in range(count):
+            arcs.append((node(("teacher", t)), sink, LOAD_COST * (load + k)))
+
+    used = _min_cost_flow(len(nodes), arcs, source, sink)
+    picked = {}
+    for a, (pos, t, reason) in choices.items():
+        if a in used:
+            picked[pos] = (t, reason)
+
+    proposals = []
+    for pos, r in enumerate(absent):
+        t, reason = picked.get(pos, (None, "no free teacher for this subject or department"))
+        proposals.append({"row": r, "substitute": t, "reason": reason})
+    return proposals
+
+
+def substituted_row(row, substitute):
+    return dict(row, teacher=substitute, label=SUBSTITUTE_PREFIX + row.get("teacher", ""))
@@ -0,0 +1,37 @@
+import os
+
+from werkzeug.security import generate_password_hash
+
+import app as webapp
+
+
+def login(client, password):
+    return client.post("/login", data={"role": "student", "email": "cs22b1001@iiitr.ac.in", "password": password})
+
+
+def session_cookie(client):
+    cookie = client.get_cookie(webapp.app.config["SESSION_COOKIE_NAME"])
+    return cookie.value if cookie else None
+
+
+def test_login_rotates_session_id(tmp_path, monkeypatch):
+    users_file = os.path.join(tmp_path, "users.txt")
+    with open(users_file, "w") as f:
+        f.write(f"cs22b1001@iiitr.ac.in,{generate_password_hash('secret')},student,Stu,CSE\n")
+    monkeypatch.setattr(webapp, "USERS_FILE", users_file)
+
+    client = webapp.app.test_client()
+    # A pre-login session the server already knows, e.g. planted by an attacker.
+    webapp.session_backend.set("planted-sid", {"theme": "dark"})
+    client.set_cookie(webapp.app.config["SESSION_COOKIE_NAME"], "planted-sid")
+
+    assert login(client, "wrong").status_code == 302
+    assert session_cookie(client) == "planted-sid"
+
+    assert login(client, "secret").headers["Location"] == "/student/dashboard"
+    sid = session_cookie(client)
+    assert sid and sid != "planted-sid"
+    assert webapp.session_backend.get("planted-sid") is None
+    data = webapp.session_backend.get(sid)
+    assert data["email"] == "cs22b1001@iiitr.ac.in"
+    assert "theme" not in data
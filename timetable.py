@@ -1,247 +1,1188 @@
 from pulp import *
+from contextlib import contextmanager
+import importlib.util
+import json
 import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from institute_config import DEFAULT_CONFIG, capacity_tiers, load_config
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_FILE = os.path.join(BASE_DIR, "data.txt")
 TIMETABLE_FILE = os.path.join(BASE_DIR, "timetable_output.txt")
+ENROLLMENT_FILE = os.path.join(BASE_DIR, "enrollments.txt")
 
 
-def run():
+# -----------------------------
+# Admin Data
+# -----------------------------
+# Rooms, slot grid and teacher priorities come from the institute config
+# store (institute_config.json, editable from the admin dashboard); the
+# defaults there are the original three rooms, Mon-Fri x S1-S4 and T1-T3.
 
-    # -----------------------------
-    # Collect output for students
-    # -----------------------------
-    output = []   # 🔥 NEW
+CONFIG_FILE = os.path.join(BASE_DIR, "institute_config.json")
 
+LATE_SLOTS = tuple(DEFAULT_CONFIG["late_slots"])
+DEFAULT_PRIORITY = DEFAULT_CONFIG["default_priority"]
 
-    # -----------------------------
-    # Read Teacher Data
-    # -----------------------------
 
-    courses = []
-    teachers = {}
-    students = {}
-    preferences = {}
-    targets = {}
+# -----------------------------
+# Weights
+# -----------------------------
 
-    try:
-        with open(DATA_FILE) as f:
+WEIGHT_PREF = 50
+WEIGHT_LATE = 10
 
-            for line in f:
 
-                if line.strip() == "":
-                    continue
+# -----------------------------
+# Model Engine
+# -----------------------------
+# "pulp" builds the model through PuLP objects (reference engine);
+# "direct" emits sparse arrays and MPS without PuLP objects.
 
-                parts = line.strip().split(",")
+ENGINE = os.environ.get("TIMETABLE_ENGINE", "pulp")
 
-                c = parts[0]
-                t = parts[1]
-                s = int(parts[2])
+# "rooms" decides x[c, s, r] directly; "classes" decides x[c, s] with
+# per-capacity-tier limits and places rooms afterwards (no room symmetry).
 
-                courses.append(c)
-                teachers[c] = t
-                students[c] = s
+FORMULATION = os.environ.get("TIMETABLE_FORMULATION", "rooms")
 
-                # Optional target department (new format)
-                start_index = 3
-                if len(parts) >= 7 and ":" not in parts[3]:
-                    targets[c] = parts[3] if parts[3] else "ALL"
-                    start_index = 4
-                else:
-                    targets[c] = "ALL"
+# Number of solver configurations raced in parallel processes (see
+# solve_portfolio); 0 or 1 runs the single default CBC solve.
 
-                # Preferences
-                prefs = []
-                for p in parts[start_index:]:
-                    if p != "-:-":
-                        d, sl = p.split(":")
-                        prefs.append(f"{d}_{sl}")
+PORTFOLIO_SIZE = int(os.environ.get("TIMETABLE_PORTFOLIO", "0"))
 
-                preferences[c] = prefs
+# Next-best timetables computed after the optimum (see find_alternatives)
+# and stored as diffs in ALTERNATIVES_FILE; 0 skips them.
 
-    except:
-        print("ERROR: data.txt missing or invalid")
-        with open(TIMETABLE_FILE, "w") as f:
-            f.write("")
-        return False, "ERROR:data.txt missing or invalid"
+ALTERNATIVES = int(os.environ.get("TIMETABLE_ALTERNATIVES", "0"))
+ALTERNATIVES_FILE = os.path.join(BASE_DIR, "timetable_alternatives.json")
 
 
-    # -----------------------------
-    # Admin Data
-    # -----------------------------
+# -----------------------------
+# Instrumentation
+# -----------------------------
 
-    rooms = {
-        "R1": 50,
-        "R2": 40,
-        "R3": 35
-    }
+class RunMetrics:
 
-    slots = [
-        "Mon_S1","Mon_S2","Mon_S3","Mon_S4",
-        "Tue_S1","Tue_S2","Tue_S3","Tue_S4",
-        "Wed_S1","Wed_S2","Wed_S3","Wed_S4",
-        "Thu_S1","Thu_S2","Thu_S3","Thu_S4",
-        "Fri_S1","Fri_S2","Fri_S3","Fri_S4"
-    ]
+    def __init__(self):
+        self.phases = {}
+        self.constraint_counts = {}
+        self.info = {}
+        self._started = time.perf_counter()
 
+    @contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - t0, 4)
 
-    # -----------------------------
-    # Priority (Senior > Junior)
-    # -----------------------------
+    def as_dict(self):
+        result = {
+            "phases": dict(self.phases),
+            "total_s": round(time.perf_counter() - self._started, 4),
+            "constraint_counts": dict(self.constraint_counts)
+        }
+        result.update(self.info)
+        return result
 
-    priority = {
-        "T1": 5,
-        "T2": 15,
-        "T3": 25
-    }
 
+def parse_cbc_log(log_text):
+    info = {}
+    m = re.search(r"^Result - (.+)$", log_text, re.M)
+    if m:
+        info["solver_result"] = m.group(1).strip()
+    m = re.search(r"^Gap:\s+(-?[\d.eE+-]+)", log_text, re.M)
+    if m:
+        info["gap"] = float(m.group(1))
+    m = re.search(r"^Lower bound:\s+(-?[\d.eE+-]+)", log_text, re.M)
+    if m:
+        info["best_bound"] = float(m.group(1))
+    return info
 
-    # -----------------------------
-    # Weights
-    # -----------------------------
 
-    WEIGHT_PREF = 50
-    WEIGHT_LATE = 10
+def write_output(output_file, lines):
+    with open(output_file, "w") as f:
+        for line in lines:
+            f.write(line + "\n")
 
 
-    # -----------------------------
-    # Model
-    # -----------------------------
+# -----------------------------
+# Read Teacher Data
+# -----------------------------
 
-    model = LpProblem("Smart_Timetable", LpMinimize)
+def parse_data_file(data_file):
 
+    courses = []
+    teachers = {}
+    students = {}
+    preferences = {}
+    targets = {}
 
-    # -----------------------------
-    # Variables
-    # -----------------------------
+    with open(data_file) as f:
 
-    x = LpVariable.dicts(
-        "x",
-        (courses, slots, rooms),
-        cat="Binary"
-    )
+        for line in f:
+
+            if line.strip() == "":
+                continue
+
+            parts = line.strip().split(",")
+
+            c = parts[0]
+            t = parts[1]
+            s = int(parts[2])
 
+            courses.append(c)
+            teachers[c] = t
+            students[c] = s
+
+            # Optional target department (new format)
+            start_index = 3
+            if len(parts) >= 7 and ":" not in parts[3]:
+                targets[c] = parts[3] if parts[3] else "ALL"
+                start_index = 4
+            else:
+                targets[c] = "ALL"
+
+            # Preferences
+            prefs = []
+            for p in parts[start_index:]:
+                if p != "-:-":
+                    d, sl = p.split(":")
+                    prefs.append(f"{d}_{sl}")
+
+            preferences[c] = prefs
+
+    return {
+        "courses": courses,
+        "teachers": teachers,
+        "students": students,
+        "preferences": preferences,
+        "targets": targets
+    }
+
+
+# -----------------------------
+# Student Enrollment
+# -----------------------------
+# enrollments.txt, one student or cohort per line:
+#   <name>,<headcount>,<course>;<course>;...
+# Courses taken by the same students must not share a slot. Rather than one
+# row per conflicting pair and slot, the conflict graph is covered with
+# cliques (every enrolment set is one; each is grown to a maximal clique)
+# and the model gets one "at most one of these courses" row per clique and
+# slot, which is both tighter and smaller than the pairwise rows.
+
+def parse_enrollment_file(enrollment_file, courses):
+    # A missing file means no enrolment data; unknown courses are ignored.
+    groups = []
+    if not enrollment_file or not os.path.exists(enrollment_file):
+        return groups
+    known = set(courses)
+    with open(enrollment_file) as f:
+        for line in f:
+            parts = line.strip().split(",", 2)
+            if len(parts) < 3:
+                continue
+            try:
+                size = int(parts[1])
+            except ValueError:
+                continue
+            taken = sorted({c.strip() for c in parts[2].split(";")} & known)
+            if size > 0 and len(taken) >= 2:
+                groups.append((parts[0].strip(), size, taken))
+    return groups
+
+
+def conflict_graph(groups):
+    # course -> {course: students taking both}. An inverted index
+    # (course -> groups) limits the set intersections to pairs that share
+    # at least one group.
+    members = {}
+    for g, (_, _, taken) in enumerate(groups):
+        for c in taken:
+            members.setdefault(c, set()).add(g)
+    adjacency = {c: {} for c in members}
+    for c, mine in members.items():
+        near = set()
+        for g in mine:
+            near.update(groups[g][2])
+        for d in near:
+            if d > c:
+                shared = sum(groups[g][1] for g in mine & members[d])
+                adjacency[c][d] = shared
+                adjacency[d][c] = shared
+    return adjacency
+
+
+def clique_cover(adjacency, groups):
+    # Greedy edge clique cover, largest enrolment sets first; a set whose
+    # edges are all covered already is skipped.
+    covered = set()
+    cliques = []
+    seeds = sorted({tuple(taken) for _, _, taken in groups}, key=lambda t: (-len(t), t))
+    for seed in seeds:
+        if all((a, b) in covered for i, a in enumerate(seed) for b in seed[i + 1:]):
+            continue
+        clique = list(seed)
+        common = set(adjacency[seed[0]]).intersection(*(adjacency[c] for c in seed[1:]))
+        while common:
+            best = max(sorted(common), key=lambda d: sum((min(c, d), max(c, d)) not in covered for c in clique))
+            clique.append(best)
+            common.intersection_update(adjacency[best])
+        clique.sort()
+        covered.update((a, b) for i, a in enumerate(clique) for b in clique[i + 1:])
+        cliques.append(clique)
+    return cliques
+
+
+def student_cliques(data, groups, metrics=None):
+    # Cliques for the model; those inside one teacher's courses are already
+    # implied by the teacher clash rows and are dropped.
+    metrics = metrics or RunMetrics()
+    adjacency = conflict_graph(groups)
+    cliques = [
+        k for k in clique_cover(adjacency, groups)
+        if len({data["teachers"][c] for c in k}) > 1
+    ]
+    metrics.info["enrollment_groups"] = len(groups)
+    metrics.info["conflict_edges"] = sum(len(n) for n in adjacency.values()) // 2
+    metrics.info["student_cliques"] = len(cliques)
+    return cliques
+
+
+# -----------------------------
+# Cost Tensor
+# -----------------------------
+# cost[c, s, r] = WEIGHT_PREF if s is not a preferred slot of c
+#               + WEIGHT_LATE if s is a late slot (late_slots, e.g. S4)
+#               + teacher priority of c
+# None of the terms depend on the room, so the (course, slot) matrix is
+# built once from masks and repeated across rooms. Returned flat in
+# (course, slot, room) order as Python numbers.
+
+def build_cost_tensor(data, rooms, slots, priority, late_slots=LATE_SLOTS, default_priority=DEFAULT_PRIORITY):
+
+    courses = data["courses"]
+    teachers = data["teachers"]
+    preferences = data["preferences"]
+    slot_index = {s: j for j, s in enumerate(slots)}
+    n_rooms = len(rooms)
+
+    prio = [priority.get(teachers[c], default_priority) for c in courses]
+    late = [WEIGHT_LATE if s.rsplit("_", 1)[-1] in late_slots else 0 for s in slots]
+
+    if np is not None:
+        pref_mask = np.zeros((len(courses), len(slots)), dtype=bool)
+        for i, c in enumerate(courses):
+            for s in preferences[c]:
+                j = slot_index.get(s)
+                if j is not None:
+                    pref_mask[i, j] = True
+        course_slot = (
+            WEIGHT_PREF * ~pref_mask
+            + np.asarray(late, dtype=np.int64)[None, :]
+            + np.asarray(prio, dtype=np.int64)[:, None]
+        )
+        return np.repeat(course_slot, n_rooms, axis=1).ravel().tolist()
+
+    costs = []
+    for i, c in enumerate(courses):
+        preferred = {slot_index[s] for s in preferences[c] if s in slot_index}
+        for j in range(len(slots)):
+            cost = (0 if j in preferred else WEIGHT_PREF) + late[j] + prio[i]
+            costs.extend([cost] * n_rooms)
+    return costs
+
+
+# -----------------------------
+# Model
+# -----------------------------
+
+def build_model(data, rooms, slots, priority, metrics=None, late_slots=LATE_SLOTS, default_priority=DEFAULT_PRIORITY):
+
+    metrics = metrics or RunMetrics()
+    courses = data["courses"]
+    teachers = data["teachers"]
+    students = data["students"]
+    preferences = data["preferences"]
+
+    model = LpProblem("Smart_Timetable", LpMinimize)
+
+    # Variables
+    with metrics.phase("variables"):
+        x = LpVariable.dicts(
+            "x",
+            (courses, slots, rooms),
+            cat="Binary"
+        )
 
-    # -----------------------------
     # Hard Constraints
-    # -----------------------------
 
     # Each course fixed number of classes
-    for c in courses:
-        model += lpSum(
-            x[c][s][r]
-            for s in slots
-            for r in rooms
-        ) == len(preferences[c])
-
-    # Teacher clash
-    for s in slots:
-        for t in set(teachers.values()):
+    before = len(model.constraints)
+    with metrics.phase("constraints_course_count"):
+        for c in courses:
             model += lpSum(
                 x[c][s][r]
-                for c in courses if teachers[c] == t
+                for s in slots
                 for r in rooms
-            ) <= 1
+            ) == len(preferences[c])
+    metrics.constraint_counts["course_count"] = len(model.constraints) - before
 
-    # Room capacity
-    for c in courses:
+    # Teacher clash
+    before = len(model.constraints)
+    with metrics.phase("constraints_teacher_clash"):
         for s in slots:
-            for r in rooms:
-                if students[c] > rooms[r]:
-                    model += x[c][s][r] == 0
+            for t in set(teachers.values()):
+                model += lpSum(
+                    x[c][s][r]
+                    for c in courses if teachers[c] == t
+                    for r in rooms
+                ) <= 1
+    metrics.constraint_counts["teacher_clash"] = len(model.constraints) - before
 
-    # Room clash
-    for s in slots:
-        for r in rooms:
-            model += lpSum(
-                x[c][s][r] for c in courses
-            ) <= 1
+    # Room capacity
+    before = len(model.constraints)
+    with metrics.phase("constraints_room_capacity"):
+        for c in courses:
+            for s in slots:
+                for r in rooms:
+                    if students[c] > rooms[r]:
+                        model += x[c][s][r] == 0
+    metrics.constraint_counts["room_capacity"] = len(model.constraints) - before
 
+    # Room clash
+    before = len(model.constraints)
+    with metrics.phase("constraints_room_clash"):
+        for s in slots:
+            for r in rooms:
+                model += lpSum(
+                    x[c][s][r] for c in courses
+                ) <= 1
+    metrics.constraint_counts["room_clash"] = len(model.constraints) - before
+
+    # Student clash (one row per conflict-graph clique and slot)
+    before = len(model.constraints)
+    with metrics.phase("constraints_student_clash"):
+        for clique in data.get("student_cliques", []):
+            for s in slots:
+                model += lpSum(
+                    x[c][s][r] for c in clique for r in rooms
+                ) <= 1
+    metrics.constraint_counts["student_clash"] = len(model.constraints) - before
 
-    # -----------------------------
     # Soft Constraint Objective
-    # -----------------------------
+    with metrics.phase("objective"):
+        costs = build_cost_tensor(data, rooms, slots, priority, late_slots, default_priority)
+        variables = [
+            x[c][s][r]
+            for c in courses
+            for s in slots
+            for r in rooms
+        ]
+        model += LpAffineExpression(zip(variables, costs))
 
-    cost_terms = []
+    metrics.info["variables"] = model.numVariables()
+    metrics.info["constraints"] = model.numConstraints()
 
-    for c in courses:
-        for s in slots:
-            for r in rooms:
+    return model, x
 
-                cost = 0
 
-                # Preference penalty
-                if s not in preferences[c]:
-                    cost += WEIGHT_PREF
+# -----------------------------
+# Solve
+# -----------------------------
 
-                # Late slot penalty
-                if s.endswith("S4"):
-                    cost += WEIGHT_LATE
+def solve_model(model, time_limit=None, metrics=None):
+    metrics = metrics or RunMetrics()
+    fd, log_path = tempfile.mkstemp(prefix="cbc_", suffix=".log")
+    os.close(fd)
+    try:
+        with metrics.phase("solve"):
+            status = model.solve(PULP_CBC_CMD(msg=False, timeLimit=time_limit, logPath=log_path))
+        with open(log_path) as f:
+            log_text = f.read()
+    finally:
+        os.remove(log_path)
+
+    info = parse_cbc_log(log_text)
+    if "solver_result" in info:
+        print("CBC:", info["solver_result"])
+    status_name = LpStatus[status]
+    if status_name == "Optimal" and "gap" not in info and model.sol_status == LpSolutionOptimal:
+        info["gap"] = 0.0
+
+    metrics.info.update(info)
+    metrics.info["status"] = status_name
+    metrics.info["objective"] = value(model.objective)
+    return status_name
+
+
+# -----------------------------
+# Direct Model Backend
+# -----------------------------
+# Same ILP as build_model(), emitted straight into column-major sparse arrays
+# without any PuLP objects. Column j is x[c, s, r] in (course, slot, room)
+# order and has three nonzeros:
+#   row i                       course c gets len(preferences[c]) classes (=)
+#   row C + k*T + teacher(c)    teacher clash in slot s (<= 1)
+#   row C + S*T + k*R + q       room clash in slot s, room r (<= 1)
+# plus one per student clique containing c (SparseModel.course_cliques) and
+# one per no-good row using (c, s) (SparseModel.nogoods).
+# Room capacity is a column upper bound of 0 rather than an equality row.
+
+class SparseModel:
+
+    def __init__(self, courses, slots, rooms):
+        self.courses = courses
+        self.slots = list(slots)
+        self.rooms = list(rooms)
+        self.n_cols = len(courses) * len(self.slots) * len(self.rooms)
+        self.n_rows = 0
+        self.costs = []
+        self.upper = []
+        self.indptr = []
+        self.indices = []
+        self.row_sense = []
+        self.rhs = []
+        # Student clash rows: course index -> clique ids; column (i, k, q)
+        # also has a 1 in row clique_base + k * n_cliques + id.
+        self.course_cliques = []
+        self.clique_base = 0
+        self.n_cliques = 0
+        # (course index, slot index) -> no-good row ids (find_alternatives)
+        self.nogoods = {}
+
+    def add_nogood(self, pairs):
+        # sum of x[c, s, *] over the (course, slot) pairs <= len(pairs) - 1
+        course_index = {c: i for i, c in enumerate(self.courses)}
+        slot_index = {s: k for k, s in enumerate(self.slots)}
+        row = self.n_rows
+        for c, s in pairs:
+            self.nogoods.setdefault((course_index[c], slot_index[s]), []).append(row)
+        self.row_sense.append("L")
+        self.rhs.append(len(pairs) - 1)
+        self.n_rows += 1
+
+    def cell(self, j):
+        n_slots = len(self.slots)
+        n_rooms = len(self.rooms)
+        i, rest = divmod(j, n_slots * n_rooms)
+        k, q = divmod(rest, n_rooms)
+        return self.courses[i], self.slots[k], self.rooms[q]
+
+
+def build_sparse_model(data, rooms, slots, priority, metrics=None, late_slots=LATE_SLOTS, default_priority=DEFAULT_PRIORITY):
+
+    metrics = metrics or RunMetrics()
+    courses = data["courses"]
+    teachers = data["teachers"]
+    students = data["students"]
+    preferences = data["preferences"]
+
+    model = SparseModel(courses, slots, rooms)
+    C, S, R = len(courses), len(model.slots), len(model.rooms)
+    teacher_ids = {t: n for n, t in enumerate(sorted(set(teachers.values())))}
+    T = len(teacher_ids)
+    course_teacher = [teacher_ids[teachers[c]] for c in courses]
+    capacities = [rooms[r] for r in model.rooms]
+
+    with metrics.phase("columns"):
+        if np is not None:
+            i = np.repeat(np.arange(C), S * R)
+            k = np.tile(np.repeat(np.arange(S), R), C)
+            q = np.tile(np.arange(R), C * S)
+            teacher_of = np.asarray(course_teacher, dtype=np.int64)
+            model.indices = np.stack(
+                [i, C + k * T + teacher_of[i], C + S * T + k * R + q], axis=1
+            ).ravel().tolist()
+            fits = (
+                np.asarray([students[c] for c in courses])[:, None]
+                <= np.asarray(capacities)[None, :]
+            )
+            model.upper = np.broadcast_to(fits[:, None, :], (C, S, R)).ravel().astype(int).tolist()
+        else:
+            for i in range(C):
+                fits = [1 if students[courses[i]] <= cap else 0 for cap in capacities]
+                for k in range(S):
+                    for q in range(R):
+                        model.indices.extend((i, C + k * T + course_teacher[i], C + S * T + k * R + q))
+                    model.upper.extend(fits)
+        model.indptr = list(range(0, 3 * model.n_cols + 1, 3))
+
+    with metrics.phase("rows"):
+        cliques = data.get("student_cliques", [])
+        Q = len(cliques)
+        model.row_sense = ["E"] * C + ["L"] * (S * T + S * R + S * Q)
+        model.rhs = [len(preferences[c]) for c in courses] + [1] * (S * T + S * R + S * Q)
+        model.n_rows = len(model.rhs)
+        if cliques:
+            course_index = {c: i for i, c in enumerate(courses)}
+            model.course_cliques = [[] for _ in courses]
+            for q, clique in enumerate(cliques):
+                for c in clique:
+                    model.course_cliques[course_index[c]].append(q)
+            model.clique_base = C + S * T + S * R
+            model.n_cliques = Q
+
+    with metrics.phase("objective"):
+        model.costs = build_cost_tensor(data, rooms, slots, priority, late_slots, default_priority)
+
+    metrics.constraint_counts["course_count"] = C
+    metrics.constraint_counts["teacher_clash"] = S * T
+    metrics.constraint_counts["room_capacity"] = model.upper.count(0)
+    metrics.constraint_counts["room_clash"] = S * R
+    metrics.constraint_counts["student_clash"] = S * Q
+    metrics.info["variables"] = model.n_cols
+    metrics.info["constraints"] = model.n_rows
+    metrics.info["nonzeros"] = len(model.indices) + S * R * sum(len(k) for k in cliques)
+
+    return model
+
+
+def write_mps(model, path, chunk=20000):
+    # One streaming pass, columns in order; CBC reads this as free MPS.
+    with open(path, "w") as f:
+        f.write("NAME Smart_Timetable\nROWS\n N OBJ\n")
+        f.write("".join(f" {sense} R{n}\n" for n, sense in enumerate(model.row_sense)))
+        f.write("COLUMNS\n    MARKER 'MARKER' 'INTORG'\n")
+        buf = []
+        indices = model.indices
+        per_course = len(model.slots) * len(model.rooms)
+        n_rooms = len(model.rooms)
+        for j in range(model.n_cols):
+            a, b, c = indices[3 * j:3 * j + 3]
+            buf.append(f"    X{j} OBJ {model.costs[j]} R{a} 1\n    X{j} R{b} 1 R{c} 1\n")
+            if model.course_cliques or model.nogoods:
+                i, rest = divmod(j, per_course)
+                k = rest // n_rooms
+                if model.course_cliques:
+                    base = model.clique_base + k * model.n_cliques
+                    buf.extend(f"    X{j} R{base + q} 1\n" for q in model.course_cliques[i])
+                buf.extend(f"    X{j} R{row} 1\n" for row in model.nogoods.get((i, k), ()))
+            if len(buf) >= chunk:
+                f.write("".join(buf))
+                buf = []
+        f.write("".join(buf))
+        f.write("    MARKER 'MARKER' 'INTEND'\nRHS\n")
+        f.write("".join(f"    RHS R{n} {rhs}\n" for n, rhs in enumerate(model.rhs)))
+        f.write("BOUNDS\n")
+        f.write("".join(f" UP BND X{j} {ub}\n" for j, ub in enumerate(model.upper)))
+        f.write("ENDATA\n")
+
+
+def read_cbc_values(path):
+    # First line: "<Status> - objective value <v>"; then "<idx> <name> <value> <dj>"
+    # for the nonzero columns. Returns (status, proven, objective, {name: value});
+    # proven is False for an incumbent left by a time/iteration limit.
+    with open(path) as f:
+        header = f.readline().split()
+        values = {}
+        for line in f:
+            parts = line.split()
+            if parts and parts[0] == "**":
+                parts = parts[1:]
+            if len(parts) < 3:
+                continue
+            values[parts[1]] = float(parts[2])
+
+    status_name = "Undefined"
+    if header:
+        status_name = {
+            "Optimal": "Optimal",
+            "Infeasible": "Infeasible",
+            "Integer": "Infeasible",
+            "Unbounded": "Unbounded",
+            "Stopped": "Not Solved"
+        }.get(header[0], "Undefined")
+        # Stopped on time/iterations with an incumbent: same rule as PuLP.
+        if status_name == "Not Solved" and len(header) >= 5 and header[4] == "objective":
+            status_name = "Optimal"
+    proven = bool(header) and header[0] in ("Optimal", "Infeasible", "Integer")
+    objective = None
+    if "value" in header:
+        objective = float(header[header.index("value") + 1])
+    return status_name, proven, objective, values
+
+
+def read_cbc_solution(path):
+    status_name, _, objective, values = read_cbc_values(path)
+    selected = [int(name[1:]) for name, v in values.items() if name.startswith("X") and round(v) == 1]
+    return status_name, objective, sorted(selected)
+
+
+def solve_sparse_model(model, time_limit=None, metrics=None):
+    metrics = metrics or RunMetrics()
+    with tempfile.TemporaryDirectory(prefix="cbc_") as tmp:
+        mps_path = os.path.join(tmp, "model.mps")
+        sol_path = os.path.join(tmp, "model.sol")
+
+        with metrics.phase("write_mps"):
+            write_mps(model, mps_path)
+
+        cmd = [PULP_CBC_CMD().path, mps_path]
+        if time_limit is not None:
+            cmd += ["-sec", str(time_limit), "-timeMode", "elapsed"]
+        cmd += ["-solve", "-solution", sol_path]
+        with metrics.phase("solve"):
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+
+        if os.path.exists(sol_path):
+            status_name, objective, selected = read_cbc_solution(sol_path)
+        else:
+            status_name, objective, selected = "Not Solved", None, []
+
+    info = parse_cbc_log(proc.stdout)
+    if "solver_result" in info:
+        print("CBC:", info["solver_result"])
+    if status_name == "Optimal" and "gap" not in info and info.get("solver_result", "").startswith("Optimal"):
+        info["gap"] = 0.0
+
+    metrics.info.update(info)
+    metrics.info["status"] = status_name
+    metrics.info["objective"] = objective
+    return status_name, selected
+
+
+# -----------------------------
+# Solver Portfolio
+# -----------------------------
+# The model is written to MPS once and several solver configurations race
+# on it in separate processes. The first proven result (optimal or
+# infeasible) wins and the rest are killed; if none proves anything by the
+# time limit, the best incumbent wins. Members stop themselves at the limit
+# and CBC can overrun it in preprocessing, so nobody is killed before some
+# member has reported. HiGHS joins when highspy is installed; CBC
+# configurations differ in seeds, cuts, heuristics and preprocessing because
+# its run time swings a lot with those.
+
+PORTFOLIO_CBC = [
+    ("cbc-default", []),
+    ("cbc-seed-1", ["-randomSeed", "1", "-randomCbcSeed", "1"]),
+    ("cbc-no-cuts", ["-cuts", "off"]),
+    ("cbc-heuristics", ["-heuristics", "on", "-rins", "on", "-proximity", "on", "-feas", "on"]),
+    ("cbc-seed-2-no-preprocess", ["-randomSeed", "2", "-randomCbcSeed", "2", "-preprocess", "off"])
+]
+PORTFOLIO_POLL_S = 0.02
+
+# python -c worker: <mps> <result.json> <time limit or "">
+HIGHS_WORKER = """
+import json, sys, highspy
+h = highspy.Highs()
+h.setOptionValue("output_flag", False)
+if sys.argv[3]:
+    h.setOptionValue("time_limit", float(sys.argv[3]))
+h.readModel(sys.argv[1])
+h.run()
+status = h.modelStatusToString(h.getModelStatus())
+has_incumbent = h.getInfo().primal_solution_status == 2
+values = {}
+if has_incumbent:
+    names = h.getLp().col_names_
+    values = {n: v for n, v in zip(names, h.getSolution().col_value) if abs(v) > 1e-9}
+with open(sys.argv[2], "w") as f:
+    json.dump({
+        "status": {"Optimal": "Optimal", "Infeasible": "Infeasible"}.get(status, "Optimal" if has_incumbent else "Not Solved"),
+        "proven": status in ("Optimal", "Infeasible"),
+        "objective": h.getInfo().objective_function_value if has_incumbent else None,
+        "values": values
+    }, f)
+"""
+
+
+def portfolio_members(size):
+    # Never more racers than cores: they would only slow each other down.
+    members = [("cbc", name, options) for name, options in PORTFOLIO_CBC]
+    if importlib.util.find_spec("highspy") is not None:
+        members.insert(1, ("highs", "highs", []))
+    return members[:max(1, min(size, os.cpu_count() or 1))]
+
+
+def _start_member(kind, name, options, mps_path, tmp, time_limit):
+    result_path = os.path.join(tmp, f"{name}.sol")
+    log_path = os.path.join(tmp, f"{name}.log")
+    if kind == "cbc":
+        cmd = [PULP_CBC_CMD().path, mps_path, *options]
+        if time_limit is not None:
+            cmd += ["-sec", str(time_limit), "-timeMode", "elapsed"]
+        cmd += ["-solve", "-solution", result_path]
+    else:
+        cmd = [sys.executable, "-c", HIGHS_WORKER, mps_path, result_path, str(time_limit or "")]
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+    return {
+        "kind": kind, "name": name, "proc": proc, "result_path": result_path,
+        "log_path": log_path, "started": time.perf_counter()
+    }
 
-                # Teacher priority
-                t = teachers[c]
-                cost += priority.get(t, 20)
 
-                cost_terms.append(cost * x[c][s][r])
+def _member_result(member):
+    # (status, proven, objective, values) or None if it left no solution.
+    if not os.path.exists(member["result_path"]):
+        return None
+    try:
+        if member["kind"] == "cbc":
+            return read_cbc_values(member["result_path"])
+        with open(member["result_path"]) as f:
+            r = json.load(f)
+        return r["status"], r["proven"], r["objective"], r["values"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _has_incumbent(member):
+    result = member.get("result")
+    return bool(result) and result[0] == "Optimal" and result[2] is not None
+
+
+def solve_portfolio(mps_path, time_limit=None, size=None, metrics=None):
+    """Race the portfolio on an MPS file; returns (status, objective, {column: value})."""
+    metrics = metrics or RunMetrics()
+    tmp = os.path.dirname(mps_path)
+    members = [
+        _start_member(kind, name, options, mps_path, tmp, time_limit)
+        for kind, name, options in portfolio_members(size or PORTFOLIO_SIZE)
+    ]
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    running = list(members)
+    finished = []
+    winner = None
+    try:
+        while running and winner is None:
+            for m in list(running):
+                if m["proc"].poll() is None:
+                    continue
+                running.remove(m)
+                m["seconds"] = round(time.perf_counter() - m["started"], 4)
+                m["result"] = _member_result(m)
+                finished.append(m)
+                if m["result"] and m["result"][1]:
+                    winner = m
+                    break
+            if deadline is not None and time.perf_counter() > deadline and any(map(_has_incumbent, finished)):
+                break
+            if winner is None and running:
+                time.sleep(PORTFOLIO_POLL_S)
+    finally:
+        for m in running:
+            m["proc"].kill()
+            m["proc"].wait()
+            m["seconds"] = round(time.perf_counter() - m["started"], 4)
+
+    if winner is None:
+        # Nobody proved anything: best incumbent.
+        incumbents = [m for m in finished if _has_incumbent(m)]
+        if incumbents:
+            winner = min(incumbents, key=lambda m: m["result"][2])
+
+    metrics.info["portfolio"] = [
+        {
+            "member": m["name"],
+            "seconds": m["seconds"],
+            "status": m["result"][0] if m.get("result") else ("Cancelled" if m in running else "No solution"),
+            "proven": bool(m.get("result") and m["result"][1]),
+            "objective": m["result"][2] if m.get("result") else None
+        }
+        for m in members
+    ]
+    if winner is None:
+        metrics.info["status"] = "Not Solved"
+        metrics.info["objective"] = None
+        return "Not Solved", None, {}
+
+    status_name, proven, objective, values = winner["result"]
+    if winner["kind"] == "cbc":
+        with open(winner["log_path"]) as f:
+            info = parse_cbc_log(f.read())
+        if "solver_result" in info:
+            print("CBC:", info["solver_result"])
+        if proven and status_name == "Optimal" and "gap" not in info:
+            info["gap"] = 0.0
+        metrics.info.update(info)
+    metrics.info["portfolio_winner"] = winner["name"]
+    metrics.info["proven"] = proven
+    metrics.info["status"] = status_name
+    metrics.info["objective"] = objective
+    return status_name, objective, values
+
+
+def solve_model_portfolio(model, time_limit=None, metrics=None, size=None):
+    # Same contract as solve_model(): variable values are set on the PuLP model.
+    metrics = metrics or RunMetrics()
+    with tempfile.TemporaryDirectory(prefix="portfolio_") as tmp:
+        mps_path = os.path.join(tmp, "model.mps")
+        with metrics.phase("write_mps"):
+            _, var_names, _, _ = model.writeMPS(mps_path, rename=1)
+        with metrics.phase("solve"):
+            status_name, _, values = solve_portfolio(mps_path, time_limit, size, metrics)
+
+    original = {new: old for old, new in var_names.items()}
+    for v in model.variables():
+        v.varValue = 0
+    model.assignVarsVals({original[n]: v for n, v in values.items() if n in original})
+    model.status = {
+        "Optimal": LpStatusOptimal,
+        "Infeasible": LpStatusInfeasible,
+        "Unbounded": LpStatusUnbounded
+    }.get(status_name, LpStatusNotSolved)
+    return status_name
+
+
+def solve_sparse_portfolio(model, time_limit=None, metrics=None, size=None):
+    # Same contract as solve_sparse_model(): (status, selected column indexes).
+    metrics = metrics or RunMetrics()
+    with tempfile.TemporaryDirectory(prefix="portfolio_") as tmp:
+        mps_path = os.path.join(tmp, "model.mps")
+        with metrics.phase("write_mps"):
+            write_mps(model, mps_path)
+        with metrics.phase("solve"):
+            status_name, _, values = solve_portfolio(mps_path, time_limit, size, metrics)
+    selected = [int(n[1:]) for n, v in values.items() if n.startswith("X") and round(v) == 1]
+    return status_name, sorted(selected)
+
+
+# -----------------------------
+# Room Classes Formulation
+# -----------------------------
+# Rooms of equal capacity are interchangeable and the objective never looks
+# at the room, so the model only decides x[c, s] and limits, per slot and
+# capacity tier, how many courses need a room of at least that size:
+#   #{c in s : students[c] > next smaller capacity} <= #{rooms >= capacity}
+# These nested (Hall) conditions are exactly what makes a course->room
+# matching exist, so assign_rooms() can place the rooms greedily afterwards.
+
+def capacity_levels(rooms):
+    # [(floor, rooms with more than `floor` seats), ...]: courses bigger than
+    # `floor` can only use those rooms. The last level is "bigger than every
+    # room" and has no rooms.
+    tiers = capacity_tiers(rooms)
+    levels = []
+    names = []
+    for k, (capacity, tier_rooms) in enumerate(tiers):
+        names = names + tier_rooms
+        floor = tiers[k + 1][0] if k + 1 < len(tiers) else 0
+        levels.append((floor, names))
+    if tiers:
+        levels.append((tiers[0][0], []))
+    return levels
+
+
+def build_class_model(data, rooms, slots, priority, metrics=None, late_slots=LATE_SLOTS, default_priority=DEFAULT_PRIORITY, elastic=False):
+    # elastic=True lets each course fall short of its class count and
+    # minimises the total shortfall instead of the timetable cost.
+
+    metrics = metrics or RunMetrics()
+    courses = data["courses"]
+    teachers = data["teachers"]
+    students = data["students"]
+    preferences = data["preferences"]
+
+    model = LpProblem("Smart_Timetable_Classes", LpMinimize)
+
+    with metrics.phase("variables"):
+        x = LpVariable.dicts("x", (courses, slots), cat="Binary")
+        short = LpVariable.dicts("short", courses, lowBound=0) if elastic else {}
+
+    before = len(model.constraints)
+    with metrics.phase("constraints_course_count"):
+        for c in courses:
+            if elastic:
+                model += lpSum(x[c][s] for s in slots) + short[c] == len(preferences[c])
+            else:
+                model += lpSum(x[c][s] for s in slots) == len(preferences[c])
+    metrics.constraint_counts["course_count"] = len(model.constraints) - before
+
+    before = len(model.constraints)
+    with metrics.phase("constraints_teacher_clash"):
+        by_teacher = {}
+        for c in courses:
+            by_teacher.setdefault(teachers[c], []).append(c)
+        for s in slots:
+            for group in by_teacher.values():
+                model += lpSum(x[c][s] for c in group) <= 1
+    metrics.constraint_counts["teacher_clash"] = len(model.constraints) - before
+
+    before = len(model.constraints)
+    with metrics.phase("constraints_room_classes"):
+        for floor, level_rooms in capacity_levels(rooms):
+            needing = [c for c in courses if students[c] > floor]
+            if not needing or len(needing) <= len(level_rooms):
+                continue
+            for s in slots:
+                model += lpSum(x[c][s] for c in needing) <= len(level_rooms)
+    metrics.constraint_counts["room_classes"] = len(model.constraints) - before
+
+    before = len(model.constraints)
+    with metrics.phase("constraints_student_clash"):
+        for clique in data.get("student_cliques", []):
+            for s in slots:
+                model += lpSum(x[c][s] for c in clique) <= 1
+    metrics.constraint_counts["student_clash"] = len(model.constraints) - before
+
+    with metrics.phase("objective"):
+        if elastic:
+            model += lpSum(short.values())
+        else:
+            costs = build_cost_tensor(data, [None], slots, priority, late_slots, default_priority)
+            variables = [x[c][s] for c in courses for s in slots]
+            model += LpAffineExpression(zip(variables, costs))
+
+    metrics.info["variables"] = model.numVariables()
+    metrics.info["constraints"] = model.numConstraints()
+    metrics.info["room_tiers"] = len(capacity_tiers(rooms))
+
+    if elastic:
+        return model, x, short
+    return model, x
+
+
+def assign_rooms(data, x, rooms, slots):
+    # Per slot: biggest class into the biggest free room. With the tier
+    # limits from build_class_model() this always finds a room.
+    courses = data["courses"]
+    students = data["students"]
+    by_size = sorted(rooms, key=lambda r: -rooms[r])
+    placed = {}
+    for s in slots:
+        scheduled = [c for c in courses if value(x[c][s]) == 1]
+        scheduled.sort(key=lambda c: -students[c])
+        for c, r in zip(scheduled, by_size):
+            if students[c] > rooms[r]:
+                raise ValueError(f"No room large enough for {c} in {s}")
+            placed[(c, s)] = r
+        if len(scheduled) > len(by_size):
+            raise ValueError(f"More classes than rooms in {s}")
+    return [(c, s, placed[(c, s)]) for c in courses for s in slots if (c, s) in placed]
+
+
+# -----------------------------
+# Infeasibility Diagnosis
+# -----------------------------
+# precheck() counts demand against supply without a solver (oversized
+# classes, per-teacher load vs slots, per-capacity-tier classes vs
+# room-slots). If those pass and CBC still says infeasible, find_conflict()
+# runs an elastic filter on the small room-classes model and then a
+# deletion filter, leaving an irreducible set of courses that cannot all be
+# scheduled together.
+
+DIAGNOSIS_SOLVE_LIMIT = 30
+
+
+def _finding(kind, message, courses, teachers, rooms):
+    return {
+        "kind": kind,
+        "message": message,
+        "courses": sorted(courses),
+        "teachers": sorted(teachers),
+        "rooms": sorted(rooms)
+    }
 
-    model += lpSum(cost_terms)
 
+def precheck(data, rooms, slots):
 
-    # -----------------------------
-    # Solve
-    # -----------------------------
+    courses = data["courses"]
+    teachers = data["teachers"]
+    students = data["students"]
+    need = {c: len(data["preferences"][c]) for c in courses}
+    largest = max(rooms.values()) if rooms else 0
+    findings = []
 
-    status = model.solve()
+    for c in courses:
+        if need[c] and students[c] > largest:
+            findings.append(_finding(
+                "class_too_large",
+                f"{c} has {students[c]} students but the largest room holds {largest}.",
+                [c], [teachers[c]], []
+            ))
+
+    by_teacher = {}
+    for c in courses:
+        by_teacher.setdefault(teachers[c], []).append(c)
+    for t, group in by_teacher.items():
+        load = sum(need[c] for c in group)
+        if load > len(slots):
+            findings.append(_finding(
+                "teacher_overload",
+                f"{t} has {load} classes to teach but there are only {len(slots)} slots.",
+                group, [t], []
+            ))
+
+    for floor, level_rooms in capacity_levels(rooms):
+        if not level_rooms:
+            continue
+        group = [c for c in courses if students[c] > floor and need[c]]
+        demand = sum(need[c] for c in group)
+        supply = len(level_rooms) * len(slots)
+        if demand > supply:
+            findings.append(_finding(
+                "room_tier_overload",
+                f"{demand} classes need a room with more than {floor} seats but only "
+                f"{len(level_rooms)} such rooms x {len(slots)} slots = {supply} are available.",
+                group, {teachers[c] for c in group}, level_rooms
+            ))
+
+    for clique in data.get("student_cliques", []):
+        demand = sum(need[c] for c in clique)
+        if demand > len(slots):
+            findings.append(_finding(
+                "student_overload",
+                f"{', '.join(clique)} share students pairwise and need {demand} separate slots "
+                f"but there are only {len(slots)}.",
+                clique, {teachers[c] for c in clique}, []
+            ))
+
+    return findings
+
+
+def subset_data(data, keep):
+    keep = set(keep)
+    result = {"courses": [c for c in data["courses"] if c in keep]}
+    for key in ("teachers", "students", "preferences", "targets"):
+        result[key] = {c: v for c, v in data[key].items() if c in keep}
+    cliques = ([c for c in k if c in keep] for k in data.get("student_cliques", []))
+    result["student_cliques"] = [k for k in cliques if len(k) > 1]
+    return result
+
+
+def _solve_quiet(model):
+    model.solve(PULP_CBC_CMD(msg=False, timeLimit=DIAGNOSIS_SOLVE_LIMIT))
+    return LpStatus[model.status]
+
+
+def _is_infeasible(data, rooms, slots):
+    model, _ = build_class_model(data, rooms, slots, {})
+    return _solve_quiet(model) == "Infeasible"
+
+
+def find_conflict(data, rooms, slots):
+
+    courses = data["courses"]
+    enforced = set()
+
+    # Elastic filter: courses that have to fall short are made hard until
+    # the elastic model itself becomes infeasible.
+    while True:
+        model, x, short = build_class_model(data, rooms, slots, {}, elastic=True)
+        for c in enforced:
+            model += short[c] == 0
+        status = _solve_quiet(model)
+        if status == "Infeasible":
+            break
+        if status != "Optimal":
+            return []
+        falling_short = {c for c in courses if c not in enforced and (value(short[c]) or 0) > 0.5}
+        if not falling_short:
+            return []
+        enforced |= falling_short
+
+    # Deletion filter: drop every course whose removal keeps it infeasible.
+    conflict = [c for c in courses if c in enforced]
+    for c in list(conflict):
+        trial = [k for k in conflict if k != c]
+        if trial and _is_infeasible(subset_data(data, trial), rooms, slots):
+            conflict = trial
+    if not conflict:
+        # Infeasible before any course was made hard: no course set to name.
+        return []
+
+    teachers = {data["teachers"][c] for c in conflict}
+    smallest = min(data["students"][c] for c in conflict)
+    fitting = [r for r in rooms if rooms[r] >= smallest]
+    classes = sum(len(data["preferences"][c]) for c in conflict)
+    room_text = ", ".join(sorted(fitting)) if len(fitting) <= 6 else f"the {len(fitting)} rooms with {smallest}+ seats"
+    return [_finding(
+        "conflict",
+        f"{', '.join(conflict)} ({classes} classes, teachers {', '.join(sorted(teachers))}) "
+        f"cannot all be scheduled together in {len(slots)} slots with {room_text}.",
+        conflict, teachers, fitting
+    )]
+
+
+def diagnosis_message(findings, limit=3):
+    if not findings:
+        return "No feasible timetable found. Check class sizes and preferences."
+    parts = [f["message"] for f in findings[:limit]]
+    if len(findings) > limit:
+        parts.append(f"(+{len(findings) - limit} more)")
+    return "No feasible timetable found. " + " ".join(parts)
+
+
+def diagnose(data_file=None, config_file=None, rooms=None, enrollment_file=None):
+    """Diagnosis mode: pre-checks, then (if they pass) a conflict search."""
+    config = load_config(config_file or CONFIG_FILE)
+    rooms = rooms or config["room_capacity"]
+    data = parse_data_file(data_file or DATA_FILE)
+    groups = parse_enrollment_file(enrollment_file or ENROLLMENT_FILE, data["courses"])
+    data["student_cliques"] = student_cliques(data, groups)
+    findings = precheck(data, rooms, config["slots"])
+    if findings:
+        return findings
+    if _is_infeasible(data, rooms, config["slots"]):
+        return find_conflict(data, rooms, config["slots"])
+    return []
+
+
+# -----------------------------
+# Output
+# -----------------------------
+
+def solution_cells(data, x, rooms, slots):
+    return (
+        (c, s, r)
+        for c in data["courses"]
+        for s in slots
+        for r in rooms
+        if value(x[c][s][r]) == 1
+    )
 
-    if LpStatus[status] != "Optimal":
-        print("No feasible timetable found")
-        with open(TIMETABLE_FILE, "w") as f:
-            f.write("")
-        return False, "No feasible timetable found. Check class sizes and preferences."
 
+def assignment_line(data, c, s, r):
+    day, sl = s.split("_")
+    return f"{day},{sl},{c},{r},{data['teachers'][c]},{data['targets'][c]}"
 
-    # -----------------------------
-    # Output
-    # -----------------------------
 
-    print("\n===== GENERATED TIMETABLE =====\n")
+def format_assignments(data, chosen):
+
+    preferences = data["preferences"]
 
+    output = []
     violations = {}
 
-    for c in courses:
-        for s in slots:
-            for r in rooms:
+    print("\n===== GENERATED TIMETABLE =====\n")
 
-                if value(x[c][s][r]) == 1:
+    for c, s, r in chosen:
 
-                    day, sl = s.split("_")
+        day, sl = s.split("_")
 
-                    # 🔥 SAVE FOR STUDENT DASHBOARD
-                    line = f"{day},{sl},{c},{r},{teachers[c]},{targets[c]}"
-                    output.append(line)
+        # 🔥 SAVE FOR STUDENT DASHBOARD
+        output.append(assignment_line(data, c, s, r))
 
-                    # Admin terminal print
-                    print(f"{c} -> {day} {sl} in {r}")
+        # Admin terminal print
+        print(f"{c} -> {day} {sl} in {r}")
 
-                    # Preference violation check
-                    if s not in preferences[c]:
-                        violations.setdefault(c, []).append(s)
+        # Preference violation check
+        if s not in preferences[c]:
+            violations.setdefault(c, []).append(s)
 
     print("\n===============================\n")
 
+    return output, violations
 
-    # -----------------------------
-    # Save timetable to file
-    # -----------------------------
-
-    with open(TIMETABLE_FILE, "w") as f:
-        for line in output:
-            f.write(line + "\n")
 
+def report_violations(data, violations, objective=None, alternatives=()):
 
-    # -----------------------------
-    # Notification System
-    # -----------------------------
+    preferences = data["preferences"]
 
     if violations:
         print("WARNING: PREFERENCE VIOLATIONS FOUND\n")
@@ -249,15 +1190,205 @@ def run():
             print(f"Course: {c}")
             print("Preferred:", preferences[c])
             print("Assigned :", violations[c])
-            print("Suggested Alternatives:")
-            for s in preferences[c]:
-                print(" -", s)
+            # Next-best timetables that give this course more preferred slots.
+            options = []
+            for rank, (alt_objective, chosen) in enumerate(alternatives, 1):
+                placed = sorted(s for course, s, _ in chosen if course == c)
+                if sum(s not in preferences[c] for s in placed) < len(violations[c]):
+                    options.append(f"alternative {rank} (cost +{alt_objective - objective:g}): {', '.join(placed)}")
+            if options:
+                print("Suggested Alternatives:")
+                for option in options:
+                    print(" -", option)
             print()
     else:
         print("All preferences satisfied.\n")
-    return True, "Timetable generated"
+
+
+# -----------------------------
+# Alternative Timetables
+# -----------------------------
+# The k next-best timetables, found by re-solving with one no-good cut per
+# timetable found so far: its (course, slot) pairs may not all be used
+# again, so every alternative moves at least one class to another slot
+# (room swaps alone do not count). CBC has no solution pool, so each
+# alternative is one more solve. They are stored as diffs against the
+# optimum, so the admin can switch between them without re-running the
+# solver.
+
+def find_alternatives(data, k, model, x, rooms, slots, first, formulation="rooms", time_limit=None, portfolio=1):
+    """Up to k next-best timetables after `first` (the optimum's
+    (course, slot, room) list), best first, as [(objective, chosen)].
+    Stops early when no other timetable exists."""
+    found = []
+    chosen = first
+    for _ in range(k):
+        pairs = {(c, s) for c, s, _ in chosen}
+        # Own metrics: the run keeps the optimum's status and objective.
+        metrics = RunMetrics()
+        if isinstance(model, SparseModel):
+            model.add_nogood(pairs)
+            if portfolio > 1:
+                status, selected = solve_sparse_portfolio(model, time_limit, metrics, portfolio)
+            else:
+                status, selected = solve_sparse_model(model, time_limit, metrics)
+            chosen = [model.cell(j) for j in selected]
+        else:
+            if formulation == "classes":
+                model += lpSum(x[c][s] for c, s in pairs) <= len(pairs) - 1
+            else:
+                model += lpSum(x[c][s][r] for c, s in pairs for r in rooms) <= len(pairs) - 1
+            if portfolio > 1:
+                status = solve_model_portfolio(model, time_limit, metrics, portfolio)
+            else:
+                status = solve_model(model, time_limit, metrics)
+            if status == "Optimal":
+                if formulation == "classes":
+                    chosen = assign_rooms(data, x, rooms, slots)
+                else:
+                    chosen = list(solution_cells(data, x, rooms, slots))
+        if status != "Optimal":
+            break
+        found.append((metrics.info["objective"], chosen))
+    return found
+
+
+def write_alternatives(path, output, objective, alternatives):
+    # {"objective", "rows": the optimum's lines, "active": rank shown (0 =
+    #  optimum), "alternatives": [{"rank", "objective", "removed", "added"}]}
+    # where removed/added are timetable_output.txt lines relative to "rows".
+    if not alternatives:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    base = set(output)
+    diffs = []
+    for rank, (alt_objective, lines) in enumerate(alternatives, 1):
+        current = set(lines)
+        diffs.append({
+            "rank": rank,
+            "objective": alt_objective,
+            "removed": [line for line in output if line not in current],
+            "added": [line for line in lines if line not in base]
+        })
+    with open(path, "w") as f:
+        json.dump({"objective": objective, "rows": output, "active": 0, "alternatives": diffs}, f)
+
+
+def run(data_file=None, output_file=None, rooms=None, time_limit=None, engine=None, config_file=None, formulation=None, enrollment_file=None, portfolio=None, alternatives=None, alternatives_file=None):
+
+    metrics = RunMetrics()
+    data_file = data_file or DATA_FILE
+    output_file = output_file or TIMETABLE_FILE
+    alternatives_file = alternatives_file or ALTERNATIVES_FILE
+    alternatives = ALTERNATIVES if alternatives is None else alternatives
+    config = load_config(config_file or CONFIG_FILE)
+    rooms = rooms or config["room_capacity"]
+    slots = config["slots"]
+    priority = config["priorities"]
+    cost_options = {"late_slots": config["late_slots"], "default_priority": config["default_priority"]}
+    engine = engine or ENGINE
+    formulation = formulation or FORMULATION
+    if formulation == "classes":
+        engine = "pulp"
+    portfolio = len(portfolio_members(PORTFOLIO_SIZE if portfolio is None else portfolio))
+    metrics.info["engine"] = engine
+    metrics.info["formulation"] = formulation
+    metrics.info["portfolio_size"] = portfolio
+    metrics.info["rooms"] = len(rooms)
+    metrics.info["slots"] = len(slots)
+
+    # Alternatives of the previous timetable no longer apply.
+    write_alternatives(alternatives_file, [], None, [])
+
+    try:
+        with metrics.phase("parse"):
+            data = parse_data_file(data_file)
+    except:
+        print("ERROR: data.txt missing or invalid")
+        write_output(output_file, [])
+        return False, "ERROR:data.txt missing or invalid", metrics.as_dict()
+
+    metrics.info["courses"] = len(data["courses"])
+
+    with metrics.phase("conflict_graph"):
+        groups = parse_enrollment_file(enrollment_file or ENROLLMENT_FILE, data["courses"])
+        data["student_cliques"] = student_cliques(data, groups, metrics)
+
+    # Obvious capacity problems are reported without running the solver.
+    with metrics.phase("precheck"):
+        findings = precheck(data, rooms, slots)
+    if findings:
+        print("No feasible timetable found")
+        metrics.info["status"] = "Infeasible"
+        metrics.info["diagnosis"] = findings
+        write_output(output_file, [])
+        return False, diagnosis_message(findings), metrics.as_dict()
+
+    if engine == "direct" and formulation != "classes":
+        model, x = build_sparse_model(data, rooms, slots, priority, metrics, **cost_options), None
+        if portfolio > 1:
+            status, selected = solve_sparse_portfolio(model, time_limit, metrics, portfolio)
+        else:
+            status, selected = solve_sparse_model(model, time_limit, metrics)
+    else:
+        if formulation == "classes":
+            model, x = build_class_model(data, rooms, slots, priority, metrics, **cost_options)
+        else:
+            model, x = build_model(data, rooms, slots, priority, metrics, **cost_options)
+        if portfolio > 1:
+            status = solve_model_portfolio(model, time_limit, metrics, portfolio)
+        else:
+            status = solve_model(model, time_limit, metrics)
+
+    if status != "Optimal":
+        print("No feasible timetable found")
+        findings = []
+        if status == "Infeasible":
+            with metrics.phase("diagnose"):
+                findings = find_conflict(data, rooms, slots)
+            metrics.info["diagnosis"] = findings
+        write_output(output_file, [])
+        return False, diagnosis_message(findings), metrics.as_dict()
+
+    with metrics.phase("extract"):
+        if formulation == "classes":
+            chosen = assign_rooms(data, x, rooms, slots)
+        elif engine == "direct":
+            chosen = [model.cell(j) for j in selected]
+        else:
+            chosen = list(solution_cells(data, x, rooms, slots))
+        output, violations = format_assignments(data, chosen)
+    metrics.info["assigned_rows"] = len(output)
+    metrics.info["violated_courses"] = len(violations)
+
+    # Save timetable to file
+    with metrics.phase("write"):
+        write_output(output_file, output)
+
+    found = []
+    if alternatives > 0:
+        with metrics.phase("alternatives"):
+            found = find_alternatives(data, alternatives, model, x, rooms, slots, chosen, formulation, time_limit, portfolio)
+            write_alternatives(
+                alternatives_file, output, metrics.info["objective"],
+                [(alt_objective, [assignment_line(data, *cell) for cell in cells]) for alt_objective, cells in found]
+            )
+        metrics.info["alternative_objectives"] = [alt_objective for alt_objective, _ in found]
+
+    # Notification System
+    report_violations(data, violations, metrics.info["objective"], found)
+    return True, "Timetable generated", metrics.as_dict()
 
 
 # Run
 if __name__ == "__main__":
-    run()
+    import sys
+    if "--diagnose" in sys.argv:
+        findings = diagnose()
+        for f in findings:
+            print(f"[{f['kind']}] {f['message']}")
+        if not findings:
+            print("No conflicts found.")
+    else:
+        run()
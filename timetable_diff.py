@@ -0,0 +1,115 @@
+# -----------------------------
+# Timetable Diff
+# -----------------------------
+# Two timetables (generation runs from timetable_history.txt or the live
+# timetable_output.txt) compared class by class. Rows are grouped by
+# (subject, teacher, target) in one pass over each side. Within a group,
+# cells present on both sides are unchanged (or relabelled, e.g. "Teacher
+# Absent"); the remaining ones are paired up as moves, same day/slot first
+# (a room change), and leftovers are added or removed. A group only holds a
+# course's few weekly classes, so the diff is linear in the number of rows.
+#
+# A substitution changes the teacher, so it shows up as one class removed
+# (absent teacher) and one added (substitute).
+
+CHANGE_KINDS = ("moved", "added", "removed", "relabelled")
+
+
+def class_key(row):
+    return (row.get("subject", ""), row.get("teacher", ""), row.get("target") or "ALL")
+
+
+def _cell(row):
+    return (row.get("day", ""), row.get("slot", ""), row.get("room", ""))
+
+
+def _place(row):
+    return {
+        "day": row.get("day", ""),
+        "slot": row.get("slot", ""),
+        "room": row.get("room", ""),
+        "label": row.get("label", "")
+    }
+
+
+def _row(key, row):
+    return dict(zip(("subject", "teacher", "target"), key), **_place(row))
+
+
+def _change(key, old, new):
+    return dict(zip(("subject", "teacher", "target"), key), **{"from": _place(old), "to": _place(new)})
+
+
+def _group(rows):
+    groups = {}
+    for row in rows:
+        groups.setdefault(class_key(row), []).append(row)
+    return groups
+
+
+def diff_timetables(old_rows, new_rows):
+    """Class-level changes from old_rows to new_rows.
+
+    Returns {"moved", "relabelled": [{subject, teacher, target, from, to}],
+    "added", "removed": [{subject, teacher, target, day, slot, room, label}],
+    "unchanged": count}.
+    """
+    old_groups = _group(old_rows)
+    new_groups = _group(new_rows)
+    diff = {kind: [] for kind in CHANGE_KINDS}
+    diff["unchanged"] = 0
+
+    keys = list(old_groups) + [key for key in new_groups if key not in old_groups]
+    for key in keys:
+        new_cells = {}
+        for row in new_groups.get(key, ()):
+            new_cells.setdefault(_cell(row), []).append(row)
+
+        left_old = []
+        for row in old_groups.get(key, ()):
+            same = new_cells.get(_cell(row))
+            if not same:
+                left_old.append(row)
+                continue
+            new = same.pop()
+            if (row.get("label") or "") != (new.get("label") or ""):
+                diff["relabelled"].append(_change(key, row, new))
+            else:
+                diff["unchanged"] += 1
+
+        # Room changes first: same day and slot on both sides.
+        by_time = {}
+        for rows in new_cells.values():
+            for row in rows:
+                by_time.setdefault(row.get("day", "") + "_" + row.get("slot", ""), []).append(row)
+        rest_old = []
+        for row in left_old:
+            same = by_time.get(row.get("day", "") + "_" + row.get("slot", ""))
+            if same:
+                diff["moved"].append(_change(key, row, same.pop()))
+            else:
+                rest_old.append(row)
+        rest_new = [row for rows in by_time.values() for row in rows]
+
+        for old, new in zip(rest_old, rest_new):
+            diff["moved"].append(_change(key, old, new))
+        diff["removed"].extend(_row(key, row) for row in rest_old[len(rest_new):])
+        diff["added"].extend(_row(key, row) for row in rest_new[len(rest_old):])
+    return diff
+
+
+def summarize(diff):
+    """Counts per change kind plus the teachers, departments and subjects touched."""
+    teachers, targets, subjects = set(), set(), set()
+    for kind in CHANGE_KINDS:
+        for change in diff[kind]:
+            teachers.add(change["teacher"])
+            targets.add(change["target"])
+            subjects.add(change["subject"])
+    summary = {kind: len(diff[kind]) for kind in CHANGE_KINDS}
+    summary["unchanged"] = diff["unchanged"]
+    summary["changed"] = sum(summary[kind] for kind in CHANGE_KINDS)
+    summary["teachers"] = sorted(t for t in teachers if t)
+    summary["targets"] = sorted(targets)
+    summary["subjects"] = sorted(subjects)
+    return summary